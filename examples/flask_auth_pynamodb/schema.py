@@ -1,9 +1,12 @@
+import os
+
 import graphene
 from flask import g, jsonify
 from flask_graphql import GraphQLView
 from flask_jwt import jwt_required
 from graphene import relay
 from graphene_pynamodb import PynamoObjectType
+from graphene_pynamodb.snapshot import SchemaSnapshot, get_introspection
  
 from app import app
 from models import User as UserModel
@@ -39,6 +42,9 @@ class Query(graphene.ObjectType):
  
  
 schema = graphene.Schema(query=Query)
+# written at build time with: python -m graphene_pynamodb.snapshot schema:schema schema.json $BUILD_ID
+schema_snapshot = SchemaSnapshot(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.json'),
+                                 build_id=os.environ.get('BUILD_ID'))
  
  
 def graphql_token_view():
@@ -52,5 +58,5 @@ app.add_url_rule('/graphql', view_func=graphql_token_view())
  
 @app.route("/graphql-schema", methods=['GET'])
 def graphql_schema():
-    schema_dict = {'data': schema.introspect()}
+    schema_dict = {'data': get_introspection(schema, schema_snapshot)}
     return jsonify(schema_dict)
@@ -1,8 +1,13 @@
 from .fields import (
-    PynamoConnectionField
+    PynamoConnectionField,
+    PynamoIndexConnectionField,
+    PynamoNodesField,
+    PynamoQueryConnectionField,
+    index_connection_fields
 )
 from .types import (
     PynamoObjectType,
 )
 
-__all__ = ['PynamoObjectType', 'PynamoConnectionField']
+__all__ = ['PynamoObjectType', 'PynamoConnectionField', 'PynamoIndexConnectionField', 'PynamoNodesField',
+           'PynamoQueryConnectionField', 'index_connection_fields']
@@ -0,0 +1,101 @@
+from __future__ import absolute_import
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pynamodb.constants import BATCH_GET_PAGE_LIMIT
+from pynamodb.exceptions import PynamoDBException
+
+from graphene_pynamodb.cache import is_throttling, item_cache
+from graphene_pynamodb.utils import get_model_metadata, serialize_key, to_cursor
+
+MAX_BATCH_WORKERS = 10
+MAX_BATCH_RETRIES = 8
+# unprocessed keys are retried after a random delay of up to base * 2^retry seconds, capped
+BACKOFF_BASE = 0.025
+BACKOFF_CAP = 1.0
+
+
+class BatchGetResult(list):
+    def __init__(self, items, missing_keys=None, unprocessed_keys=None, chunks=0, retries=0):
+        super(BatchGetResult, self).__init__(items)
+        # keys of items that do not exist, and keys DynamoDB still had not processed after the last retry
+        self.missing_keys = missing_keys or []
+        self.unprocessed_keys = unprocessed_keys or []
+        self.chunks = chunks
+        self.retries = retries
+
+
+def serialize_item_key(key, metadata):
+    values = key if isinstance(key, tuple) else (key,)
+    return dict((name, {key_type: serialize(value)}) for name, key_type, serialize, value in zip(
+        metadata.key_attribute_names, metadata.key_types, metadata.key_serializers, values))
+
+
+def backoff(retry):
+    time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** retry)))
+
+
+def batch_get(model, keys, attributes_to_get=None, max_workers=MAX_BATCH_WORKERS, max_retries=MAX_BATCH_RETRIES):
+    # keys are hash keys, or (hash key, range key) tuples. Items come back in the order of the keys (repeated for
+    # repeated keys) without the keys that were not found.
+    metadata = get_model_metadata(model)
+    key_attributes = metadata.key_attributes
+    raw_keys = dict((key, serialize_item_key(key, metadata)) for key in keys)
+    keys_by_cursor = dict((to_cursor(raw_key), key) for key, raw_key in raw_keys.items())
+    unique_keys = list(keys_by_cursor.values())
+
+    found = {}
+    if item_cache.is_cached(model):
+        cached = ((key, item_cache.get(model, key, attributes_to_get)) for key in unique_keys)
+        found = dict((key, item) for key, item in cached if item is not None)
+    unread_keys = [key for key in unique_keys if key not in found]
+    chunks = [unread_keys[i:i + BATCH_GET_PAGE_LIMIT] for i in range(0, len(unread_keys), BATCH_GET_PAGE_LIMIT)]
+
+    def read_chunk(chunk):
+        (items, retries) = ([], 0)
+        pending = [raw_keys[key] for key in chunk]
+        while True:
+            (page, unprocessed) = model._batch_get_page(pending, consistent_read=None,
+                                                        attributes_to_get=attributes_to_get)
+            items.extend(model.from_raw_data(data) for data in page or [])
+            if not unprocessed or retries == max_retries:
+                return items, retries, unprocessed or []
+            retries += 1
+            backoff(retries)
+            pending = unprocessed
+
+    try:
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                pages = list(executor.map(read_chunk, chunks))
+        else:
+            pages = [read_chunk(chunk) for chunk in chunks]
+    except PynamoDBException as e:
+        # while DynamoDB is throttling, expired items can stand in for the ones that could not be read
+        stale = dict((key, item_cache.get_stale(model, key, attributes_to_get)) for key in unread_keys)
+        if not is_throttling(e) or None in stale.values():
+            raise
+        found.update(stale)
+        pages = []
+
+    unprocessed_keys = []
+    for (items, _, unprocessed) in pages:
+        for item in items:
+            found[keys_by_cursor[to_cursor(serialize_key(item, key_attributes))]] = item
+            item_cache.put(item, attributes_to_get)
+        for raw_key in unprocessed:
+            key = keys_by_cursor[to_cursor(raw_key)]
+            stale = item_cache.get_stale(model, key, attributes_to_get)
+            if stale is None:
+                unprocessed_keys.append(key)
+            else:
+                found[key] = stale
+
+    unread = set(unprocessed_keys)
+    return BatchGetResult([found[key] for key in keys if key in found],
+                          missing_keys=[key for key in unique_keys if key not in found and key not in unread],
+                          unprocessed_keys=unprocessed_keys,
+                          chunks=len(chunks),
+                          retries=sum(retries for (_, retries, _) in pages))
@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import RLock
+
+from pynamodb.exceptions import PynamoDBException
+
+from graphene_pynamodb.utils import get_item_key
+
+DEFAULT_CACHE_SIZE = 10000
+THROTTLING_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+
+def is_throttling(error):
+    return isinstance(error, PynamoDBException) and error.cause_response_code in THROTTLING_ERRORS
+
+
+def get_cache_key(model, key):
+    return (model,) + (key if isinstance(key, tuple) else (key,))
+
+
+class ItemCache(object):
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        # model -> (seconds items stay fresh, whether expired items are served while DynamoDB is throttling)
+        self.models = {}
+        # (model, hash key[, range key]) -> (raw data of the item, attributes it was read with or None, expiry), least
+        # recent first. Every hit builds a new item from the data, so requests never share mutable items.
+        self.entries = OrderedDict()
+        self.lock = RLock()
+
+    def configure(self, model, ttl, serve_stale=False):
+        self.models[model] = (ttl, serve_stale)
+        # writes through the model invalidate its cached items
+        for name in ('save', 'update', 'delete'):
+            method = getattr(model, name)
+            if not getattr(method, 'invalidates_cache', False):
+                setattr(model, name, invalidating(method, self))
+
+    def is_cached(self, model):
+        return model in self.models
+
+    def serves_stale(self, model):
+        return model in self.models and self.models[model][1]
+
+    def get(self, model, key, attributes_to_get=None, stale=False):
+        cache_key = get_cache_key(model, key)
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is None:
+                return None
+            (data, attributes, expires) = entry
+            if expires < time.time() and not stale:
+                if not self.serves_stale(model):
+                    del self.entries[cache_key]
+                return None
+            if attributes is not None and not (attributes_to_get and set(attributes_to_get) <= attributes):
+                return None
+            # most recently used last
+            del self.entries[cache_key]
+            self.entries[cache_key] = entry
+        return model.from_raw_data(data)
+
+    def get_stale(self, model, key, attributes_to_get=None):
+        # expired items too, for the models that serve them while DynamoDB is throttling
+        return self.get(model, key, attributes_to_get, stale=True) if self.serves_stale(model) else None
+
+    def put(self, item, attributes_to_get=None):
+        model = item.__class__
+        if model not in self.models:
+            return
+        cache_key = get_cache_key(model, get_item_key(item))
+        attributes = set(attributes_to_get) if attributes_to_get else None
+        data = item._serialize(attr_map=True, null_check=False)['attributes']
+        now = time.time()
+        with self.lock:
+            entry = self.entries.pop(cache_key, None)
+            # keep the fresh item read with the most attributes
+            if entry is None or entry[2] < now or attributes is None or entry[1] is not None and attributes >= entry[1]:
+                entry = (data, attributes, now + self.models[model][0])
+            self.entries[cache_key] = entry
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, item):
+        with self.lock:
+            self.entries.pop(get_cache_key(item.__class__, get_item_key(item)), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def invalidating(method, cache):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            cache.invalidate(self)
+
+    wrapper.invalidates_cache = True
+    return wrapper
+
+
+# the process wide cache of the models that set cache_ttl in the Meta of their PynamoObjectType
+item_cache = ItemCache()
+
+
+def cached_get(model, key, attributes_to_get=None):
+    # model.get through the item cache, keys are hash keys or (hash key, range key) tuples
+    keys = key if isinstance(key, tuple) else (key,)
+    get_args = {'attributes_to_get': attributes_to_get} if attributes_to_get else {}
+    if not item_cache.is_cached(model):
+        return model.get(*keys, **get_args)
+
+    item = item_cache.get(model, key, attributes_to_get)
+    if item is not None:
+        return item
+    try:
+        item = model.get(*keys, **get_args)
+    except PynamoDBException as e:
+        stale = item_cache.get_stale(model, key, attributes_to_get) if is_throttling(e) else None
+        if stale is None:
+            raise
+        return stale
+    item_cache.put(item, attributes_to_get)
+    return item
@@ -0,0 +1,103 @@
+from functools import reduce
+
+from graphene import Boolean, Float, InputObjectType, List, NonNull, String
+from pynamodb.attributes import NumberAttribute
+
+
+class StringKeyCondition(InputObjectType):
+    eq = String()
+    begins_with = String()
+    between = List(NonNull(String))
+    gt = String()
+    gte = String()
+    lt = String()
+    lte = String()
+
+
+class NumberKeyCondition(InputObjectType):
+    eq = Float()
+    between = List(NonNull(Float))
+    gt = Float()
+    gte = Float()
+    lt = Float()
+    lte = Float()
+
+
+class StringFilter(InputObjectType):
+    eq = String()
+    ne = String()
+    in_ = List(NonNull(String), name='in')
+    begins_with = String()
+    contains = String()
+    between = List(NonNull(String))
+    exists = Boolean()
+
+
+class NumberFilter(InputObjectType):
+    eq = Float()
+    ne = Float()
+    in_ = List(NonNull(Float), name='in')
+    between = List(NonNull(Float))
+    exists = Boolean()
+
+
+class BooleanFilter(InputObjectType):
+    eq = Boolean()
+    ne = Boolean()
+    exists = Boolean()
+
+
+class StringSetFilter(InputObjectType):
+    contains = String()
+    exists = Boolean()
+
+
+class NumberSetFilter(InputObjectType):
+    contains = Float()
+    exists = Boolean()
+
+
+def get_key_condition_type(attribute):
+    if isinstance(attribute, NumberAttribute):
+        return NumberKeyCondition
+    return StringKeyCondition
+
+
+def between(attribute, value):
+    if len(value) != 2:
+        raise ValueError("between expects a list of two values, got %d" % len(value))
+    return attribute.between(*value)
+
+
+OPERATORS = {
+    'eq': lambda attribute, value: attribute == value,
+    'ne': lambda attribute, value: attribute != value,
+    'gt': lambda attribute, value: attribute > value,
+    'gte': lambda attribute, value: attribute >= value,
+    'lt': lambda attribute, value: attribute < value,
+    'lte': lambda attribute, value: attribute <= value,
+    'in_': lambda attribute, value: attribute.is_in(*value),
+    'begins_with': lambda attribute, value: attribute.startswith(value),
+    'contains': lambda attribute, value: attribute.contains(value),
+    'between': between,
+    'exists': lambda attribute, value: attribute.exists() if value else attribute.does_not_exist(),
+}
+
+
+def build_key_condition(attribute, condition):
+    operations = [(operation, value) for operation, value in condition.items() if value is not None]
+    if len(operations) != 1:
+        raise ValueError("Expected exactly one operation in the key condition on %s, got %d"
+                         % (attribute.attr_name, len(operations)))
+
+    (operation, value) = operations[0]
+    return OPERATORS[operation](attribute, value)
+
+
+def build_filter_condition(model, filters):
+    # every operation on every attribute has to match
+    attributes = model.get_attributes()
+    conditions = [OPERATORS[operation](attributes[name], value)
+                  for name, operations in filters.items() if operations
+                  for operation, value in operations.items() if value is not None]
+    return reduce(lambda left, right: left & right, conditions) if conditions else None
@@ -1,13 +1,15 @@
 import json
+from collections import OrderedDict
 
-from graphene import Dynamic, Field, Float
+from graphene import Dynamic, Float, InputObjectType
 from graphene import ID, Boolean, List, String
 from graphene.types.json import JSONString
 from pynamodb import attributes
 from singledispatch import singledispatch
 
 from graphene_pynamodb import relationships
-from graphene_pynamodb.fields import PynamoConnectionField
+from graphene_pynamodb.conditions import BooleanFilter, NumberFilter, NumberSetFilter, StringFilter, StringSetFilter
+from graphene_pynamodb.fields import PynamoConnectionField, PynamoRelationshipField
 from graphene_pynamodb.relationships import OneToOne, OneToMany
 
 
@@ -41,12 +43,12 @@ def convert_relationship_to_dynamic(type, attribute, registry=None):
             return None
 
         if isinstance(attribute, OneToOne):
-            return Field(_type)
+            return PynamoRelationshipField(_type)
 
         if isinstance(attribute, OneToMany):
             if _type._meta.connection:
                 return PynamoConnectionField(_type)
-            return Field(List(_type))
+            return PynamoRelationshipField(List(_type))
 
     return Dynamic(dynamic_type)
 
@@ -120,3 +122,54 @@ def convert_list_to_list(type, attribute, registry=None):
         return ListOfMapToObject(description=name, required=required)
     else:
         return List(String, description=attribute.attr_name)
+
+
+@singledispatch
+def convert_pynamo_attribute_to_filter(type, attribute, registry=None):
+    # attributes without a filter input can not be filtered on
+    return None
+
+
+@convert_pynamo_attribute_to_filter.register(attributes.UnicodeAttribute)
+def convert_string_to_filter(type, attribute, registry=None):
+    return StringFilter(description=attribute.attr_name)
+
+
+@convert_pynamo_attribute_to_filter.register(attributes.NumberAttribute)
+def convert_number_to_filter(type, attribute, registry=None):
+    return NumberFilter(description=attribute.attr_name)
+
+
+@convert_pynamo_attribute_to_filter.register(attributes.BooleanAttribute)
+def convert_boolean_to_filter(type, attribute, registry=None):
+    return BooleanFilter(description=attribute.attr_name)
+
+
+@convert_pynamo_attribute_to_filter.register(attributes.UnicodeSetAttribute)
+def convert_string_set_to_filter(type, attribute, registry=None):
+    return StringSetFilter(description=attribute.attr_name)
+
+
+@convert_pynamo_attribute_to_filter.register(attributes.NumberSetAttribute)
+def convert_number_set_to_filter(type, attribute, registry=None):
+    return NumberSetFilter(description=attribute.attr_name)
+
+
+def convert_type_to_filter(_type):
+    # one filter input per object type, with a filter for every exposed attribute that supports it
+    registry = _type._meta.registry
+    filter_type = registry.get_filter_for_type(_type)
+    if filter_type:
+        return filter_type
+
+    model_attributes = _type._meta.model.get_attributes()
+    fields = OrderedDict()
+    for name in _type._meta.fields:
+        if name in model_attributes:
+            converted = convert_pynamo_attribute_to_filter(model_attributes[name], model_attributes[name], registry)
+            if converted is not None:
+                fields[name] = converted
+
+    filter_type = type('{}Filter'.format(_type._meta.name), (InputObjectType,), fields)
+    registry.register_filter(_type, filter_type)
+    return filter_type
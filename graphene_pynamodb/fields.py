@@ -1,24 +1,69 @@
 from __future__ import absolute_import
 
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from itertools import islice
 
-from graphene import Int
+from graphene import ID, Boolean, Field, Int, List, NonNull
 from graphene import relay
+from graphene.utils.str_converters import to_snake_case
 from graphene.relay.connection import PageInfo
 from graphql_relay import from_global_id
 from graphql_relay import to_global_id
 from graphql_relay.connection.connectiontypes import Edge
+from promise import is_thenable
+from pynamodb.constants import ITEM_COUNT
 
-from graphene_pynamodb.relationships import RelationshipResultList
-from graphene_pynamodb.utils import get_key_name
+from graphene_pynamodb.cache import cached_get
+from graphene_pynamodb.conditions import build_filter_condition, build_key_condition, get_key_condition_type
+from graphene_pynamodb.loaders import DEFAULT_PREFETCH_FAN_OUT, get_loader, prefetch, remember
+from graphene_pynamodb.planner import INDEX_QUERY, QUERY, SCAN, CallableQueryPlan, QueryPlan, as_query_plan, \
+    get_attribute_name, get_indexes, get_index_key_attributes, plan_query
+from graphene_pynamodb.relationships import RelationshipResult, RelationshipResultList
+from graphene_pynamodb.utils import get_key_attributes, serialize_key, to_cursor, from_cursor, \
+    coerce_key, is_selected, get_projection, get_node_field_asts, \
+    get_key_attribute_names, is_key_only, get_model_metadata, get_key_value, to_key_string, \
+    connection_for_type
+
+
+MAX_SCAN_WORKERS = 10
 
 
 class PynamoConnectionField(relay.ConnectionField):
     total_count = Int()
 
     def __init__(self, type, *args, **kwargs):
+        # native pagination maps first/after directly onto the DynamoDB Limit/ExclusiveStartKey of root scans
+        self.native_pagination = kwargs.pop('native_pagination', False)
+        # use the item count from the table description (refreshed by DynamoDB every ~6 hours) for totalCount
+        self.approximate_count = kwargs.pop('approximate_count', False)
+        # read root scans as total_segments parallel segments on a pool of at most max_workers threads
+        self.total_segments = kwargs.pop('total_segments', None)
+        self.max_workers = kwargs.pop('max_workers', None) or min(self.total_segments or 1, MAX_SCAN_WORKERS)
+        # read the relationships selected on a page, down to prefetch_depth levels, before they are resolved
+        self.prefetch_depth = kwargs.pop('prefetch_depth', 0)
+        self.prefetch_fan_out = kwargs.pop('prefetch_fan_out', DEFAULT_PREFETCH_FAN_OUT)
+        # refuse to resolve connections whose query plan falls back to a scan
+        self.allow_scan = kwargs.pop('allow_scan', True)
+        # an explain argument that returns the query plan in queryPlan instead of reading the page
+        explain = kwargs.pop('explain', False)
+        if self.total_segments or explain or not self.allow_scan or self.prefetch_depth:
+            self.native_pagination = True
+        # typed filter arguments, planned as a get, batch get, query on the table or an index, or a filtered scan
+        if kwargs.pop('filters', False):
+            from .converter import convert_type_to_filter
+            kwargs.setdefault('filter', convert_type_to_filter(type)())
+        connection = type._meta.connection
+        if explain:
+            if 'query_plan' not in connection._meta.fields:
+                if type._meta.connection_factory is None:
+                    raise ValueError("explain needs a connection with a query_plan field, "
+                                     "%s has none" % connection.__name__)
+                connection = connection_for_type(type, '{}ExplainConnection'.format(type.__name__), explain=True)
+            kwargs.setdefault('explain', Boolean())
         super(PynamoConnectionField, self).__init__(
-            type._meta.connection,
+            connection,
             *args,
             **kwargs
         )
@@ -29,76 +74,240 @@ class PynamoConnectionField(relay.ConnectionField):
 
     @classmethod
     def get_query(cls, model, info, **args):
-        return model.scan
+        return plan_query(model, args.get('filter'), page_size=args.get('first') or args.get('last'))
+
+    @classmethod
+    def get_count(cls, model, info, **args):
+        return as_query_plan(model, cls.get_query(model, info, **args)).count()
+
+    @classmethod
+    def get_approximate_count(cls, model, info, **args):
+        # the table description knows nothing about filters or partitions
+        plan = as_query_plan(model, cls.get_query(model, info, **args))
+        if plan.operation != SCAN or plan.filter_condition is not None or isinstance(plan, CallableQueryPlan):
+            return cls.get_count(model, info, **args)
+        return model.describe_table().get(ITEM_COUNT)
 
     # noinspection PyMethodOverriding
     @classmethod
     def connection_resolver(cls, resolver, connection, model, root, info, **args):
         iterable = resolver(root, info, **args)
 
-        first = args.get('first')
-        last = args.get('last')
-        (_, after) = from_global_id(args.get('after')) if args.get('after') else (None, None)
-        (_, before) = from_global_id(args.get('before')) if args.get('before') else (None, None)
-        has_previous_page = bool(after)
-        page_size = first if first else last if last else None
-
         # get a full scan query since we have no resolved iterable from relationship or resolver function
         if not iterable and not root:
-            query = cls.get_query(model, info, **args)
+            # get_query overrides may still return a callable such as model.scan
+            query = as_query_plan(model, cls.get_query(model, info, **args))
+            query.attributes_to_get = get_node_projection(connection, info)
             iterable = query()
-            if first or last or after or before:
+            if args.get('first') or args.get('last') or args.get('after') or args.get('before'):
                 raise NotImplementedError(
                     "DynamoDB scan operations have no predictable sort. Arguments first, last, after " +
-                    "and before will have unpredictable results")
+                    "and before will have unpredictable results. Use native_pagination=True to page through scans")
+
+        return cls.resolve_iterable(iterable, connection, model, info, **args)
+
+    def native_connection_resolver(self, resolver, connection, model, root, info, **args):
+        iterable = resolver(root, info, **args)
+        if iterable or root:
+            return self.resolve_iterable(iterable, connection, model, info, **args)
+
+        query = as_query_plan(model, self.get_query(model, info, **args))
+        if args.get('explain'):
+            return self.build_page(connection, model, info, [], False, False, query_plan=query, **args)
+        if query.operation == SCAN and not self.allow_scan:
+            raise ValueError("Refusing to scan the %s table, filter on the key of the table or of an index"
+                             % model.Meta.table_name)
+
+        query.attributes_to_get = get_node_projection(connection, info)
+        if self.total_segments and query.operation == SCAN:
+            return self.resolve_segmented_page(query, connection, model, info, **args)
+        return self.resolve_page(query, connection, model, info, **args)
+
+    def resolve_page(self, query, connection, model, info, **args):
+        first = args.get('first')
+        last = args.get('last')
+        after = from_cursor(args['after']) if args.get('after') else None
+        before = from_cursor(args['before']) if args.get('before') else None
+
+        if (last or before) and not query.ordered:
+            raise NotImplementedError(
+                "DynamoDB scan operations can only be paginated forward. Arguments last and before are not supported")
+        if before and (first or after):
+            raise NotImplementedError("Arguments first and after can not be combined with before")
+        if after and last and not first:
+            # the last items after a cursor are only known after reading to the end of the partition
+            raise NotImplementedError("Argument last can only be combined with after together with first")
+
+        # only read the requested page: the page size is the read limit and the cursor the exclusive start key
+        if last and not first or before:
+            results = query(limit=last, last_evaluated_key=before, scan_index_forward=False)
+            entities = list(results)[::-1]
+            has_previous_page = bool(last) and results.last_evaluated_key is not None
+            has_next_page = bool(before)
+        else:
+            results = query(limit=first, last_evaluated_key=after)
+            entities = list(results)
+            has_previous_page = bool(after)
+            has_next_page = bool(first) and results.last_evaluated_key is not None
+            if last and len(entities) > last:
+                entities = entities[-last:]
+                has_previous_page = True
+
+        remember(info, entities, query.attributes_to_get)
+        key_attributes = query.key_attributes
+        edges = [connection.Edge(node=entity, cursor=to_cursor(serialize_key(entity, key_attributes)))
+                 for entity in entities]
+
+        return self.build_page(connection, model, info, edges, has_previous_page, has_next_page, query_plan=query,
+                               **args)
+
+    def resolve_segmented_page(self, query, connection, model, info, **args):
+        if args.get('last') or args.get('before'):
+            raise NotImplementedError(
+                "DynamoDB scan operations can only be paginated forward. Arguments last and before are not supported")
+
+        first = args.get('first')
+        # the cursor holds the progress of every segment: null when not started, false when done, else its start key
+        segments = from_cursor(args['after']).get('segments') if args.get('after') else [None] * self.total_segments
+        if not isinstance(segments, list) or len(segments) != self.total_segments:
+            raise ValueError("Invalid cursor for a scan of %d segments: %s" % (self.total_segments, args['after']))
+
+        # split the page size over the segments that still have items
+        active = [segment for segment, state in enumerate(segments) if state is not False]
+        limits = dict((segment, None) for segment in active)
+        if first:
+            limits = dict((segment, first // len(active) + (1 if i < first % len(active) else 0))
+                          for i, segment in enumerate(active))
+
+        def scan_segment(segment):
+            results = query(segment=segment, total_segments=self.total_segments, limit=limits[segment],
+                            last_evaluated_key=segments[segment])
+            return list(results), results.last_evaluated_key or False
+
+        scanned = [segment for segment in active if limits[segment] != 0]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(scanned) or 1)) as executor:
+            pages = dict(zip(scanned, executor.map(scan_segment, scanned)))
 
-        iterable = iterable if isinstance(iterable, list) else list(iterable) if iterable else []
-        if last:
-            iterable = iterable[-last:]
+        next_segments = list(segments)
+        for segment, (entities, last_evaluated_key) in pages.items():
+            next_segments[segment] = last_evaluated_key
+            remember(info, entities, query.attributes_to_get)
 
-        (has_next, edges) = cls.get_edges_from_iterable(iterable, model, info, edge_type=connection.Edge, after=after,
-                                                        page_size=page_size)
+        # edges are ordered by segment: an edge cursor resumes its own segment after the edge, the segments
+        # before it where this page left them and the segments after it where this page started
+        key_attributes = get_key_attributes(model)
+        edges = []
+        for segment in scanned:
+            for entity in pages[segment][0]:
+                state = next_segments[:segment] + [serialize_key(entity, key_attributes)] + segments[segment + 1:]
+                edges.append(connection.Edge(node=entity, cursor=to_cursor({'segments': state})))
 
-        key_name = get_key_name(model)
-        try:
-            start_cursor = getattr(edges[0].node, key_name)
-            end_cursor = getattr(edges[-1].node, key_name)
-        except IndexError:
-            start_cursor = None
-            end_cursor = None
+        # the end cursor also skips segments that were read to the end without returning items
+        has_next_page = any(state is not False for state in next_segments)
+        return self.build_page(connection, model, info, edges, bool(args.get('after')), has_next_page,
+                               end_cursor=to_cursor({'segments': next_segments}), query_plan=query, **args)
+
+    def build_page(self, connection, model, info, edges, has_previous_page, has_next_page, end_cursor=None,
+                   query_plan=None, **args):
+        if self.prefetch_depth and edges:
+            prefetch(info, connection._meta.node, [edge.node for edge in edges], get_node_field_asts(info),
+                     self.prefetch_depth, self.prefetch_fan_out)
 
         optional_args = {}
-        total_count = len(iterable)
-        if 'total_count' in connection._meta.fields:
-            optional_args["total_count"] = total_count
+        if 'total_count' in connection._meta.fields and is_selected(info, 'total_count') and not args.get('explain'):
+            get_count = self.get_approximate_count if self.approximate_count else self.get_count
+            optional_args['total_count'] = get_count(model, info, **args)
+        if args.get('explain'):
+            optional_args['query_plan'] = query_plan
 
-        # Construct the connection
         return connection(
             edges=edges,
             page_info=PageInfo(
-                start_cursor=start_cursor if start_cursor else '',
-                end_cursor=end_cursor if end_cursor else '',
+                start_cursor=edges[0].cursor if edges else '',
+                end_cursor=end_cursor or (edges[-1].cursor if edges else ''),
                 has_previous_page=has_previous_page,
-                has_next_page=has_next
+                has_next_page=has_next_page
             ),
             **optional_args
         )
 
+    @classmethod
+    def resolve_iterable(cls, iterable, connection, model, info, **args):
+        first = args.get('first')
+        last = args.get('last')
+        (_, after) = from_global_id(args.get('after')) if args.get('after') else (None, None)
+        (_, before) = from_global_id(args.get('before')) if args.get('before') else (None, None)
+        has_previous_page = bool(after)
+        page_size = first if first else last if last else None
+
+        count_total = 'total_count' in connection._meta.fields and is_selected(info, 'total_count')
+
+        if iterable and not isinstance(iterable, list):
+            if last:
+                # the tail of a lazy iterable is only known at the end, but only the last items need to be kept
+                (total_count, iterable) = consume_tail(iterable, last)
+            else:
+                # pull only what the page needs from lazy iterables (generators, ResultIterator...)
+                (has_next, edges, total_count) = cls.get_edges_from_stream(
+                    iterable, model, info, edge_type=connection.Edge, after=after, page_size=page_size,
+                    count_all=count_total)
+                iterable = None
+        else:
+            iterable = iterable if iterable else []
+            total_count = len(iterable)
+            if last:
+                iterable = iterable[-last:]
+
+        if iterable is not None:
+            (has_next, edges) = cls.get_edges_from_iterable(iterable, model, info, edge_type=connection.Edge,
+                                                            after=after, page_size=page_size,
+                                                            projection=get_node_projection(connection, info),
+                                                            key_only=is_key_only_page(connection, info))
+
+        def build_connection(edges):
+            # the cursors of the page can be passed back as after and before
+            start_cursor = edges[0].cursor if edges else None
+            end_cursor = edges[-1].cursor if edges else None
+
+            optional_args = {}
+            if count_total:
+                optional_args["total_count"] = total_count
+
+            # Construct the connection
+            return connection(
+                edges=edges,
+                page_info=PageInfo(
+                    start_cursor=start_cursor if start_cursor else '',
+                    end_cursor=end_cursor if end_cursor else '',
+                    has_previous_page=has_previous_page,
+                    has_next_page=has_next
+                ),
+                **optional_args
+            )
+
+        if is_thenable(edges):
+            return edges.then(build_connection)
+        return build_connection(edges)
+
     def get_resolver(self, parent_resolver):
+        if self.native_pagination:
+            return partial(self.native_connection_resolver, parent_resolver, self.type, self.model)
         return partial(self.connection_resolver, parent_resolver, self.type, self.model)
 
     @classmethod
-    def get_edges_from_iterable(cls, iterable, model, info, edge_type=Edge, after=None, page_size=None):
+    def get_edges_from_iterable(cls, iterable, model, info, edge_type=Edge, after=None, page_size=None,
+                                projection=None, key_only=False):
         has_next = False
 
-        key_name = get_key_name(model)
+        metadata = get_model_metadata(model)
+        key_name = metadata.key_name
         after_index = 0
         if after:
-            after_index = next((i for i, item in enumerate(iterable) if str(getattr(item, key_name)) == after), None)
+            after_index = seek_cursor(iterable, metadata, after)
             if after_index is None:
-                return None
-            else:
-                after_index += 1
+                # nothing follows a cursor that is not in the list
+                return [False, []]
+            after_index += 1
 
         if page_size:
             has_next = len(iterable) - after_index > page_size
@@ -106,11 +315,258 @@ class PynamoConnectionField(relay.ConnectionField):
         else:
             iterable = iterable[after_index:]
 
-        # trigger a batch get to speed up query instead of relying on lazy individual gets
-        if isinstance(iterable, RelationshipResultList):
-            iterable = iterable.resolve()
+        def get_edges(entities):
+            edges = []
+            for i, entity in enumerate(entities):
+                # missing items are skipped
+                if entity is None:
+                    continue
+                # cursors carry the position of the edge so the next page can seek to it without a scan
+                cursor = to_global_id(model.__name__, '%d:%s' % (
+                    after_index + i, to_key_string(metadata, get_key_value(entity, key_name))))
+                edges.append(edge_type(node=entity, cursor=cursor))
+            return edges
+
+        # trigger a batch get to speed up query instead of relying on lazy individual gets, with the pages of every
+        # parent resolved together when the request has a loader. Pages that only select keys and cursors are built
+        # from the keys of the relationship, without a read.
+        if isinstance(iterable, RelationshipResultList) and not key_only:
+            loader = get_loader(info, model, projection)
+            if loader is not None:
+                return [has_next, loader.load_many(iterable.get_keys()).then(get_edges)]
+            iterable = iterable.resolve(projection)
 
-        edges = [edge_type(node=entity, cursor=to_global_id(model.__name__, getattr(entity, key_name)))
-                 for entity in iterable]
+        return [has_next, get_edges(iterable)]
 
-        return [has_next, edges]
+    @classmethod
+    def get_edges_from_stream(cls, iterable, model, info, edge_type=Edge, after=None, page_size=None,
+                              count_all=False):
+        metadata = get_model_metadata(model)
+        key_name = metadata.key_name
+        iterator = iter(iterable)
+        after_index = 0
+        if after:
+            cursor_keys = get_cursor_keys(after)
+            for item in iterator:
+                after_index += 1
+                if to_key_string(metadata, get_key_value(item, key_name)) in cursor_keys:
+                    break
+            else:
+                return [False, [], after_index]
+
+        # one item past the page tells whether there is a next page
+        page = list(islice(iterator, page_size + 1)) if page_size else list(iterator)
+        has_next = len(page) > page_size if page_size else False
+        count = after_index + len(page) + (sum(1 for _ in iterator) if count_all and has_next else 0)
+        page = page[:page_size] if page_size else page
+
+        edges = [edge_type(node=entity, cursor=to_global_id(model.__name__, '%d:%s' % (
+            after_index + i, to_key_string(metadata, get_key_value(entity, key_name)))))
+            for i, entity in enumerate(page)]
+
+        return [has_next, edges, count]
+
+
+def get_key_at(iterable, key_name, index):
+    if isinstance(iterable, RelationshipResultList):
+        return iterable.get_key(index)
+    return get_key_value(iterable[index], key_name)
+
+
+def get_node_projection(connection, info):
+    return get_projection(info, connection._meta.node, get_node_field_asts(info)) if info else None
+
+
+def is_key_only_page(connection, info):
+    return info is not None and is_key_only(info, connection._meta.node, get_node_field_asts(info))
+
+
+def get_cursor_keys(cursor):
+    # the keys a cursor can refer to: its key part when it has a position, else (or also) the whole value
+    (hint, separator, key) = cursor.partition(':')
+    return (key, cursor) if separator and hint.isdigit() else (cursor,)
+
+
+def consume_tail(iterable, size):
+    tail = deque(maxlen=size)
+    count = 0
+    for item in iterable:
+        tail.append(item)
+        count += 1
+    return count, list(tail)
+
+
+def seek_cursor(iterable, metadata, cursor):
+    # cursors are "<position>:<key>", the position is only a hint and has to match the key at that position
+    (hint, separator, key) = cursor.partition(':')
+    if separator and hint.isdigit():
+        index = int(hint)
+        if index < len(iterable) and to_key_string(metadata, get_key_at(iterable, metadata.key_name, index)) == key:
+            return index
+
+        index = index_of_key(iterable, metadata, key)
+        if index is not None:
+            return index
+
+    # cursors without a position (or whose key contains a colon) fall back to the full value
+    return index_of_key(iterable, metadata, cursor)
+
+
+def index_of_key(iterable, metadata, key):
+    if isinstance(iterable, RelationshipResultList):
+        return iterable.index_of_key(key)
+    return next((i for i, item in enumerate(iterable)
+                 if to_key_string(metadata, get_key_value(item, metadata.key_name)) == key), None)
+
+
+class PynamoRelationshipField(Field):
+    def get_resolver(self, parent_resolver):
+        return partial(self.relationship_resolver, parent_resolver, self.type)
+
+    @classmethod
+    def relationship_resolver(cls, resolver, _type, root, info, **args):
+        value = resolver(root, info, **args)
+        node_type = _type.of_type if hasattr(_type, 'of_type') else _type
+        resolved = isinstance(value, RelationshipResult) and not isinstance(value.__wrapped__, type)
+        if resolved or is_key_only(info, node_type):
+            return value
+
+        projection = get_projection(info, node_type)
+        if projection is not None and set(projection) <= set(get_key_attribute_names(node_type._meta.model)):
+            return value
+
+        # batch the loads of every parent resolved in the same tick through the request's loader
+        loader = get_loader(info, node_type._meta.model, projection)
+        if isinstance(value, RelationshipResult) and loader is not None:
+            return loader.load(value._self_key)
+        if isinstance(value, RelationshipResultList) and loader is not None:
+            return loader.load_many(value.get_keys()).then(lambda entities: [
+                entity for entity in entities if entity is not None])
+
+        # load the relationship with only the selected attributes before its fields are resolved, into an item of its
+        # own since the proxy on the parent item is shared by the other selections of the relationship
+        if projection is not None and isinstance(value, RelationshipResult):
+            return cached_get(node_type._meta.model, value._self_key, projection)
+        if projection is not None and isinstance(value, RelationshipResultList):
+            return value.resolve(projection)
+        return value
+
+
+class PynamoQueryConnectionField(PynamoConnectionField):
+    def __init__(self, type, *args, **kwargs):
+        key_attributes = get_key_attributes(type._meta.model)
+        (hash_key_name, _) = key_attributes[0]
+        kwargs.setdefault(hash_key_name, ID(required=True))
+        if len(key_attributes) > 1:
+            (range_key_name, range_key) = key_attributes[1]
+            kwargs.setdefault(range_key_name, get_key_condition_type(range_key)())
+
+        kwargs['native_pagination'] = True
+        super(PynamoQueryConnectionField, self).__init__(type, *args, **kwargs)
+
+    @classmethod
+    def get_query(cls, model, info, **args):
+        key_attributes = get_key_attributes(model)
+        (hash_key_name, hash_key) = key_attributes[0]
+        range_key_condition = None
+        if len(key_attributes) > 1:
+            (range_key_name, range_key) = key_attributes[1]
+            if args.get(range_key_name):
+                range_key_condition = build_key_condition(range_key, args[range_key_name])
+
+        filter_condition = build_filter_condition(model, args['filter']) if args.get('filter') else None
+        return QueryPlan(model, QUERY, hash_key=coerce_key(hash_key, args[hash_key_name]),
+                         range_key_condition=range_key_condition, filter_condition=filter_condition,
+                         page_size=args.get('first') or args.get('last'))
+
+
+class PynamoIndexConnectionField(PynamoConnectionField):
+    def __init__(self, type, index, *args, **kwargs):
+        self.index = index
+        model = type._meta.model
+        attributes = model.get_attributes()
+        index_keys = get_index_key_attributes(index)
+        kwargs.setdefault(get_attribute_name(attributes, index_keys[0]), ID(required=True))
+        if len(index_keys) > 1:
+            kwargs.setdefault(get_attribute_name(attributes, index_keys[1]), get_key_condition_type(index_keys[1])())
+
+        kwargs['native_pagination'] = True
+        super(PynamoIndexConnectionField, self).__init__(type, *args, **kwargs)
+
+    # the index is only known to the field, so these are not classmethods
+    def get_query(self, model, info, **args):
+        attributes = model.get_attributes()
+        index_keys = get_index_key_attributes(self.index)
+        hash_key = index_keys[0]
+        range_key_condition = None
+        if len(index_keys) > 1:
+            range_key = index_keys[1]
+            if args.get(get_attribute_name(attributes, range_key)):
+                range_key_condition = build_key_condition(range_key, args[get_attribute_name(attributes, range_key)])
+
+        filter_condition = build_filter_condition(model, args['filter']) if args.get('filter') else None
+        return QueryPlan(model, INDEX_QUERY, index=self.index,
+                         hash_key=coerce_key(hash_key, args[get_attribute_name(attributes, hash_key)]),
+                         range_key_condition=range_key_condition, filter_condition=filter_condition,
+                         page_size=args.get('first') or args.get('last'))
+
+    def get_count(self, model, info, **args):
+        return self.get_query(model, info, **args).count()
+
+    def get_approximate_count(self, model, info, **args):
+        return self.get_count(model, info, **args)
+
+
+def index_connection_fields(*types):
+    # a mixin for the query type with an index connection field per secondary index of the types' models:
+    # <models>_by_<hash key>, or <models>_by_<hash key>_and_<range key> when an other index has the same hash key
+    fields = OrderedDict()
+    for _type in types:
+        model = _type._meta.model
+        attributes = model.get_attributes()
+        for index in get_indexes(model):
+            names = [get_attribute_name(attributes, attr) for attr in get_index_key_attributes(index)]
+            name = '{}s_by_{}'.format(to_snake_case(model.__name__), names[0])
+            if name in fields:
+                name = '{}_and_{}'.format(name, names[1]) if len(names) > 1 else name
+            if name in fields:
+                raise ValueError("%s has more than one index on %s" % (model.__name__, ', '.join(names)))
+            fields[name] = PynamoIndexConnectionField(_type, index)
+
+    return type('IndexConnectionFields', (object,), fields)
+
+
+class PynamoNodesField(Field):
+    # nodes(ids: [ID!]!): the nodes of global ids in their order, read with one batch_get per type instead of one get
+    # per id. Ids that can not be decoded or whose node does not exist resolve to null.
+    def __init__(self, node=relay.Node, *args, **kwargs):
+        kwargs.setdefault('ids', NonNull(List(NonNull(ID))))
+        super(PynamoNodesField, self).__init__(List(node), *args, **kwargs)
+        self.node_type = node
+
+    def get_resolver(self, parent_resolver):
+        return partial(self.nodes_resolver, self.node_type)
+
+    @classmethod
+    def nodes_resolver(cls, node_type, root, info, ids, **args):
+        nodes = [None] * len(ids)
+        ids_by_type = OrderedDict()
+        for position, global_id in enumerate(ids):
+            try:
+                (type_name, id) = node_type.from_global_id(global_id)
+            except (TypeError, ValueError):
+                continue
+            # ids of types that are unknown or not nodes, scalars included, resolve to null too
+            graphene_type = getattr(info.schema.get_type(type_name), 'graphene_type', None)
+            if graphene_type is not None and node_type in getattr(graphene_type._meta, 'interfaces', ()):
+                ids_by_type.setdefault(graphene_type, []).append((position, id))
+
+        for graphene_type, type_ids in ids_by_type.items():
+            get_nodes = getattr(graphene_type, 'get_nodes', None)
+            if get_nodes is not None:
+                items = get_nodes(info, [id for _, id in type_ids])
+            else:
+                items = [graphene_type.get_node(info, id) for _, id in type_ids]
+            for (position, _), item in zip(type_ids, items):
+                nodes[position] = item
+        return nodes
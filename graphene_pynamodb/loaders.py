@@ -0,0 +1,191 @@
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+from graphql.language import ast
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from graphene_pynamodb.batch import batch_get
+from graphene_pynamodb.relationships import OneToMany, Relationship, RelationshipResult, RelationshipResultList
+from graphene_pynamodb.utils import get_item_key, get_key_value, get_model_metadata, get_field_names, \
+    get_node_field_asts, get_projection, get_selections, get_type_names, is_key_only
+
+# where the request scope is kept on the request context, as a key of dict contexts or an attribute of other contexts
+LOADERS_KEY = 'pynamo_loaders'
+IDENTITY_MAP_KEY = 'pynamo_identity_map'
+# the most keys of one relationship field prefetched for a level, the others are loaded when they are resolved
+DEFAULT_PREFETCH_FAN_OUT = 1000
+
+
+class IdentityMap(object):
+    def __init__(self):
+        # (model, hash key[, range key]) -> (item, the attributes it was read with or None for all of them)
+        self.items = {}
+
+    def get(self, model, key, attributes_to_get=None):
+        entry = self.items.get((model,) + (key if isinstance(key, tuple) else (key,)))
+        if entry is None:
+            return None
+        (item, attributes) = entry
+        if attributes is None or attributes_to_get and set(attributes_to_get) <= attributes:
+            return item
+        return None
+
+    def add(self, item, attributes_to_get=None):
+        key = (item.__class__,) + get_item_key(item)
+        attributes = set(attributes_to_get) if attributes_to_get else None
+        entry = self.items.get(key)
+        # keep the item read with the most attributes
+        if entry is None or attributes is None or entry[1] is not None and attributes >= entry[1]:
+            self.items[key] = (item, attributes)
+
+
+class ModelLoader(DataLoader):
+    def __init__(self, model, attributes_to_get=None, identity_map=None):
+        # every key loaded in the same execution tick is read by one batch_get, in concurrent chunks of 100 keys
+        super(ModelLoader, self).__init__()
+        self.model = model
+        self.attributes_to_get = attributes_to_get
+        self.identity_map = identity_map
+
+    def batch_load_fn(self, keys):
+        items = {}
+        if self.identity_map is not None:
+            items = dict((key, self.identity_map.get(self.model, key, self.attributes_to_get)) for key in keys)
+
+        key_name = get_model_metadata(self.model).key_name
+        unread = [key for key in keys if items.get(key) is None]
+        for item in batch_get(self.model, unread, attributes_to_get=self.attributes_to_get) if unread else []:
+            items[get_key_value(item, key_name)] = item
+            if self.identity_map is not None:
+                self.identity_map.add(item, self.attributes_to_get)
+        # missing items load as None
+        return Promise.resolve([items.get(key) for key in keys])
+
+
+def get_request_scope(context, key, factory):
+    if context is None:
+        return None
+    if isinstance(context, dict):
+        if key not in context:
+            context[key] = factory()
+        return context[key]
+
+    value = getattr(context, key, None)
+    if value is None:
+        value = factory()
+        try:
+            setattr(context, key, value)
+        except AttributeError:
+            # contexts that do not take attributes get no request scope
+            return None
+    return value
+
+
+def get_loaders(context):
+    return get_request_scope(context, LOADERS_KEY, dict)
+
+
+def get_identity_map(info):
+    return get_request_scope(info.context if info else None, IDENTITY_MAP_KEY, IdentityMap)
+
+
+def get_loader(info, model, attributes_to_get=None):
+    loaders = get_loaders(info.context if info else None)
+    if loaders is None:
+        return None
+
+    key = (model, tuple(attributes_to_get) if attributes_to_get else None)
+    if key not in loaders:
+        loaders[key] = ModelLoader(model, attributes_to_get, get_identity_map(info))
+    return loaders[key]
+
+
+def remember(info, items, attributes_to_get=None):
+    # add items read by the library to the request's identity map
+    identity_map = get_identity_map(info)
+    if identity_map is not None:
+        for item in items:
+            identity_map.add(item, attributes_to_get)
+
+
+def prefetch(info, graphene_type, items, field_asts, depth, fan_out=DEFAULT_PREFETCH_FAN_OUT):
+    # read the relationships selected on items before they are resolved, level by level down to depth, with one
+    # batch_get per model and projection for each level. The items go to the request's identity map, where the
+    # relationship loaders find them.
+    identity_map = get_identity_map(info)
+    if identity_map is None:
+        return
+
+    level = [(graphene_type, items, field_asts)]
+    while level and depth > 0:
+        depth -= 1
+        reads = OrderedDict()
+        for (parent_type, parents, parent_field_asts) in level:
+            for (node_type, keys, node_field_asts) in get_selected_relationships(info, parent_type, parents,
+                                                                                 parent_field_asts, fan_out):
+                projection = get_projection(info, node_type, node_field_asts)
+                read = reads.setdefault((node_type._meta.model, tuple(projection) if projection else None), [])
+                read.append((node_type, keys, node_field_asts))
+
+        level = []
+        for (model, projection), selections in reads.items():
+            attributes_to_get = list(projection) if projection else None
+            keys = OrderedDict((key, None) for (_, node_keys, _) in selections for key in node_keys)
+            unread = [key for key in keys if identity_map.get(model, key, attributes_to_get) is None]
+            for item in batch_get(model, unread, attributes_to_get=attributes_to_get) if unread else []:
+                identity_map.add(item, attributes_to_get)
+
+            for (node_type, node_keys, node_field_asts) in selections:
+                nodes = [identity_map.get(model, key, attributes_to_get) for key in node_keys]
+                level.append((node_type, [node for node in nodes if node is not None], node_field_asts))
+
+
+def get_selected_relationships(info, graphene_type, items, field_asts, fan_out):
+    # (type, keys, field asts) of the relationships of items that are selected and need a read
+    attributes = graphene_type._meta.model.get_attributes()
+    field_names = get_field_names(graphene_type)
+    for (selection, selection_asts) in get_selections(info, field_asts, get_type_names(graphene_type)).items():
+        name = field_names.get(selection)
+        attribute = attributes.get(name)
+        if not isinstance(attribute, Relationship) or getattr(graphene_type, 'resolve_' + name, None):
+            continue
+        node_type = graphene_type._meta.registry.get_type_for_model(attribute.model)
+        if node_type is None:
+            continue
+
+        page_size = None
+        node_field_asts = selection_asts
+        if isinstance(attribute, OneToMany) and node_type._meta.connection:
+            # only the first page of connections, the position of other pages is not known before they are resolved
+            arguments = get_arguments(info, selection_asts)
+            if arguments.get('after') or arguments.get('before') or arguments.get('last'):
+                continue
+            page_size = arguments.get('first')
+            node_field_asts = get_node_field_asts(info, selection_asts)
+        if is_key_only(info, node_type, node_field_asts):
+            continue
+
+        keys = []
+        for item in items:
+            value = getattr(item, name, None)
+            if isinstance(value, RelationshipResult) and isinstance(value.__wrapped__, type):
+                keys.append(value._self_key)
+            elif isinstance(value, RelationshipResultList):
+                keys.extend(value[:page_size].get_keys() if page_size else value.get_keys())
+        if keys:
+            yield node_type, keys[:fan_out], node_field_asts
+
+
+def get_arguments(info, field_asts):
+    arguments = {}
+    for argument in field_asts[0].arguments or []:
+        value = argument.value
+        if isinstance(value, ast.Variable):
+            arguments[argument.name.value] = (info.variable_values or {}).get(value.name.value)
+        elif isinstance(value, ast.IntValue):
+            arguments[argument.name.value] = int(value.value)
+        else:
+            arguments[argument.name.value] = getattr(value, 'value', value)
+    return arguments
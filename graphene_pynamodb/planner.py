@@ -0,0 +1,290 @@
+from __future__ import absolute_import
+
+import math
+from inspect import getmembers
+
+import graphene
+from pynamodb.constants import ALL, ITEM_COUNT
+from pynamodb.exceptions import DoesNotExist
+from pynamodb.indexes import Index
+
+from graphene_pynamodb.batch import batch_get, serialize_item_key
+from graphene_pynamodb.cache import cached_get
+from graphene_pynamodb.conditions import OPERATORS, build_filter_condition
+from graphene_pynamodb.utils import get_key_attributes, get_model_metadata, scan_count
+
+GET = 'get'
+BATCH_GET = 'batch_get'
+QUERY = 'query'
+INDEX_QUERY = 'index_query'
+SCAN = 'scan'
+
+# filter operations DynamoDB accepts in a key condition on the range key
+RANGE_KEY_OPERATIONS = ('eq', 'begins_with', 'between')
+# an eventually consistent read costs half a read unit per started 4KB
+READ_UNIT_SIZE = 4096
+# a query request reads at most 1MB of its partition
+QUERY_PAGE_BYTES = 1024 * 1024
+TABLE_SIZE_BYTES = 'TableSizeBytes'
+
+
+class QueryPlanType(graphene.ObjectType):
+    operation = graphene.String()
+    index_name = graphene.String()
+    key_condition = graphene.String()
+    filter_condition = graphene.String()
+    estimated_read_units = graphene.Float()
+
+    class Meta:
+        name = 'QueryPlan'
+
+    def resolve_key_condition(self, info, **args):
+        return repr(self.key_condition) if self.key_condition is not None else None
+
+    def resolve_filter_condition(self, info, **args):
+        return repr(self.filter_condition) if self.filter_condition is not None else None
+
+    def resolve_estimated_read_units(self, info, **args):
+        return self.estimate_read_units()
+
+
+class ItemList(list):
+    last_evaluated_key = None
+
+
+class QueryPlan(object):
+    def __init__(self, model, operation, index=None, hash_key=None, range_key_condition=None, filter_condition=None,
+                 keys=None, page_size=None):
+        self.model = model
+        self.operation = operation
+        self.index = index
+        self.hash_key = hash_key
+        self.range_key_condition = range_key_condition
+        self.filter_condition = filter_condition
+        # the (hash key, range key) tuples, or hash keys, read by get and batch_get plans
+        self.keys = keys
+        self.page_size = page_size
+        self.attributes_to_get = None
+
+    @property
+    def index_name(self):
+        return self.index.Meta.index_name if self.index else None
+
+    @property
+    def ordered(self):
+        # everything but a scan returns items in key order and can be read backwards
+        return self.operation != SCAN
+
+    @property
+    def key_attributes(self):
+        # the attributes of a LastEvaluatedKey: the table keys, plus the index keys for index queries
+        key_attributes = get_key_attributes(self.model)
+        if self.index:
+            attributes = dict((attr.attr_name, (name, attr)) for name, attr in self.model.get_attributes().items())
+            key_attributes += [attributes[attr.attr_name] for attr in get_index_key_attributes(self.index)
+                               if attributes[attr.attr_name] not in key_attributes]
+        return key_attributes
+
+    @property
+    def key_condition(self):
+        if self.operation in (GET, BATCH_GET, SCAN):
+            return None
+        hash_key = get_index_key_attributes(self.index)[0] if self.index else get_key_attributes(self.model)[0][1]
+        condition = hash_key == self.hash_key
+        return condition & self.range_key_condition if self.range_key_condition is not None else condition
+
+    def __call__(self, **kwargs):
+        if self.attributes_to_get is not None:
+            kwargs.setdefault('attributes_to_get', self.attributes_to_get)
+        if kwargs.get('attributes_to_get'):
+            # cursors are built from the keys of the table and of the index
+            kwargs['attributes_to_get'] = sorted(set(kwargs['attributes_to_get']) |
+                                                 set(attr.attr_name for _, attr in self.key_attributes))
+        if self.operation in (GET, BATCH_GET):
+            return self.get_items(**kwargs)
+        if self.operation == SCAN:
+            kwargs.pop('scan_index_forward', None)
+            return self.scan(**kwargs)
+        if self.index and self.index.Meta.projection.projection_type != ALL:
+            return self.get_index_items(**kwargs)
+        return self.model.query(self.hash_key, range_key_condition=self.range_key_condition,
+                                filter_condition=self.filter_condition, index_name=self.index_name, **kwargs)
+
+    def scan(self, **kwargs):
+        return self.model.scan(filter_condition=self.filter_condition, **kwargs)
+
+    def get_items(self, limit=None, last_evaluated_key=None, scan_index_forward=None, attributes_to_get=None):
+        metadata = get_model_metadata(self.model)
+        keys = [key if isinstance(key, tuple) else (key,) for key in self.keys]
+        if scan_index_forward is False:
+            keys.reverse()
+
+        # page through the keys like DynamoDB pages through a query: the last evaluated key is the last key read
+        serialized = [serialize_item_key(key, metadata) for key in keys]
+        start = serialized.index(last_evaluated_key) + 1 if last_evaluated_key in serialized else 0
+        end = start + limit if limit else len(keys)
+
+        results = self.read_keys(keys[start:end], attributes_to_get)
+        results.last_evaluated_key = serialized[end - 1] if end < len(keys) else None
+        return results
+
+    def get_index_items(self, attributes_to_get=None, **kwargs):
+        # the index does not have every attribute: query it for the keys, then read the items they point to
+        results = self.model.query(self.hash_key, range_key_condition=self.range_key_condition,
+                                   filter_condition=self.filter_condition, index_name=self.index_name, **kwargs)
+        key_attributes = get_key_attributes(self.model)
+        items = self.read_keys([tuple(getattr(item, name) for name, _ in key_attributes) for item in results],
+                               attributes_to_get)
+        items.last_evaluated_key = results.last_evaluated_key
+        return items
+
+    def read_keys(self, keys, attributes_to_get=None):
+        if self.operation != GET:
+            return ItemList(batch_get(self.model, [key if len(key) > 1 else key[0] for key in keys],
+                                      attributes_to_get=attributes_to_get))
+        try:
+            return ItemList([cached_get(self.model, keys[0], attributes_to_get)] if keys else [])
+        except DoesNotExist:
+            return ItemList()
+
+    def count(self):
+        if self.operation in (GET, BATCH_GET):
+            return len(self.get_items(attributes_to_get=[attr.attr_name for _, attr in get_key_attributes(self.model)]))
+        if self.operation == SCAN:
+            return scan_count(self.model, filter_condition=self.filter_condition)
+        return self.model.count(self.hash_key, range_key_condition=self.range_key_condition,
+                                filter_condition=self.filter_condition, index_name=self.index_name)
+
+    def estimate_read_units(self):
+        description = self.model.describe_table()
+        item_count = description.get(ITEM_COUNT) or 0
+        item_size = description.get(TABLE_SIZE_BYTES, 0) / float(item_count) if item_count else 0
+
+        if self.operation == GET:
+            return read_units(item_size)
+        if self.operation == BATCH_GET:
+            return len(self.keys) * read_units(item_size)
+        page_units = read_units(min(self.page_size or 0, item_count) * item_size)
+        if self.operation == SCAN:
+            # reads are billed on what is read, before the filter: without a filter the page size bounds the read,
+            # else only the table does
+            if self.page_size and self.filter_condition is None:
+                return page_units
+            return read_units(item_count * item_size)
+        # queries only read their partition (or index partition): the page, or the first request's 1MB of it without
+        # a page size. Filtered queries read more than the page as the filter discards items.
+        if self.page_size:
+            return page_units
+        return read_units(min(item_count * item_size, QUERY_PAGE_BYTES))
+
+    def __repr__(self):
+        return '<QueryPlan %s%s>' % (self.operation, ' on %s' % self.index_name if self.index else '')
+
+
+class CallableQueryPlan(QueryPlan):
+    # the callable get_query used to return, such as model.scan, planned as a scan of unknown order
+    def __init__(self, model, query):
+        super(CallableQueryPlan, self).__init__(model, SCAN)
+        self.query = query
+
+    def scan(self, **kwargs):
+        return self.query(**kwargs)
+
+    def count(self):
+        return sum(1 for _ in self.query())
+
+
+def as_query_plan(model, query):
+    return query if isinstance(query, QueryPlan) else CallableQueryPlan(model, query)
+
+
+def read_units(size):
+    return max(1, int(math.ceil(size / READ_UNIT_SIZE))) * 0.5
+
+
+def get_indexes(model):
+    return [index for _, index in sorted(getmembers(model, lambda o: isinstance(o, Index)), key=lambda m: m[0])]
+
+
+def get_index_key_attributes(index):
+    attributes = index._get_attributes().values()
+    return [attr for attr in attributes if attr.is_hash_key] + [attr for attr in attributes if attr.is_range_key]
+
+
+def key_value(value):
+    # number filters are floats, keys are usually integers
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def plan_query(model, filters=None, page_size=None):
+    filters = dict((name, dict((operation, value) for operation, value in operations.items() if value is not None))
+                   for name, operations in (filters or {}).items() if operations)
+    filters = dict((name, operations) for name, operations in filters.items() if operations)
+    attributes = model.get_attributes()
+    key_attributes = get_key_attributes(model)
+    (hash_key_name, _) = key_attributes[0]
+    range_key_name = key_attributes[1][0] if len(key_attributes) > 1 else None
+
+    def remaining(*used):
+        # the filter without the operations used by the key condition
+        rest = dict((name, dict((operation, value) for operation, value in operations.items()
+                                if (name, operation) not in used))
+                    for name, operations in filters.items())
+        return build_filter_condition(model, rest)
+
+    hash_operations = filters.get(hash_key_name, {})
+    range_operations = filters.get(range_key_name, {}) if range_key_name else {}
+
+    # a full key only reads the item itself
+    if 'eq' in hash_operations and (not range_key_name or 'eq' in range_operations):
+        used = [(hash_key_name, 'eq')] + ([(range_key_name, 'eq')] if range_key_name else [])
+        if remaining(*used) is None:
+            key = tuple(key_value(filters[name]['eq']) for name, _ in used)
+            return QueryPlan(model, GET, keys=[key if range_key_name else key[0]], page_size=page_size)
+
+    if 'in_' in hash_operations and (not range_key_name or 'eq' in range_operations):
+        used = [(hash_key_name, 'in_')] + ([(range_key_name, 'eq')] if range_key_name else [])
+        if remaining(*used) is None:
+            hash_keys = [key_value(value) for value in hash_operations['in_']]
+            keys = [(key, key_value(range_operations['eq'])) for key in hash_keys] if range_key_name else hash_keys
+            # keep the first occurrence of a key, batch_get rejects duplicates
+            keys = sorted(set(keys), key=keys.index)
+            return QueryPlan(model, BATCH_GET, keys=keys, page_size=page_size)
+
+    # then the table, then the first index that has a key condition on its range key too
+    candidates = [(None, attributes[hash_key_name], range_key_name and attributes[range_key_name])]
+    for index in get_indexes(model):
+        if index.Meta.projection.projection_type != ALL:
+            # other projections do not return whole items
+            continue
+        index_keys = get_index_key_attributes(index)
+        candidates.append((index, index_keys[0], index_keys[1] if len(index_keys) > 1 else None))
+
+    plans = []
+    for (index, hash_key, range_key) in candidates:
+        hash_name = get_attribute_name(attributes, hash_key)
+        if 'eq' not in filters.get(hash_name, {}):
+            continue
+        used = [(hash_name, 'eq')]
+        range_key_condition = None
+        range_name = get_attribute_name(attributes, range_key) if range_key else None
+        range_operations = filters.get(range_name, {}) if range_name else {}
+        operation = next((operation for operation in RANGE_KEY_OPERATIONS if operation in range_operations), None)
+        if operation:
+            used.append((range_name, operation))
+            range_key_condition = OPERATORS[operation](range_key, range_operations[operation])
+        key_operations = [(name, operation) for name in (hash_name, range_name) for operation in filters.get(name, {})]
+        if any(key_operation not in used for key_operation in key_operations):
+            # the keys of a query can not be in its filter
+            continue
+        plans.append(QueryPlan(model, INDEX_QUERY if index else QUERY, index=index,
+                               hash_key=key_value(filters[hash_name]['eq']), range_key_condition=range_key_condition,
+                               filter_condition=remaining(*used), page_size=page_size))
+
+    if plans:
+        return next((plan for plan in plans if plan.range_key_condition is not None), plans[0])
+    return QueryPlan(model, SCAN, filter_condition=build_filter_condition(model, filters), page_size=page_size)
+
+
+def get_attribute_name(attributes, attribute):
+    return next(name for name, attr in attributes.items() if attr.attr_name == attribute.attr_name)
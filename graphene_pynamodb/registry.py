@@ -3,6 +3,7 @@ class Registry(object):
         self._registry = {}
         self._registry_models = {}
         self._registry_composites = {}
+        self._registry_filters = {}
 
     def register(self, cls):
         from .types import PynamoObjectType
@@ -19,6 +20,12 @@ class Registry(object):
     def get_type_for_model(self, model):
         return self._registry.get(model)
 
+    def register_filter(self, cls, filter_type):
+        self._registry_filters[cls] = filter_type
+
+    def get_filter_for_type(self, cls):
+        return self._registry_filters.get(cls)
+
 
 registry = None
 
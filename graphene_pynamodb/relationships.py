@@ -1,10 +1,16 @@
-from pynamodb.attributes import Attribute, NumberAttribute
-from pynamodb.constants import STRING, ATTR_TYPE_MAP, NUMBER_SHORT, LIST, STRING_SET_SHORT, LIST_SHORT
+from array import array
+from threading import RLock
+
+from pynamodb.attributes import Attribute, UnicodeAttribute
+from pynamodb.constants import STRING, NUMBER_SHORT, LIST, STRING_SET_SHORT, LIST_SHORT
 from pynamodb.models import Model
 from six import string_types
 from wrapt import ObjectProxy
 
-from graphene_pynamodb.utils import get_key_name
+from graphene_pynamodb.batch import batch_get
+from graphene_pynamodb.cache import cached_get
+from graphene_pynamodb.utils import coerce_number, from_key_string, get_key_name, get_key_value, get_model_metadata, \
+    to_key_string
 
 
 class RelationshipResult(ObjectProxy):
@@ -19,55 +25,301 @@ class RelationshipResult(ObjectProxy):
     def __getattr__(self, name):
         if name == self._self_key_name:
             return self._self_key
+        if isinstance(self._self_key_name, tuple) and name in self._self_key_name:
+            return self._self_key[self._self_key_name.index(name)]
         if not name.startswith('_') and isinstance(self.__wrapped__, type):
-            self.__wrapped__ = self._self_model.get(self._self_key)
+            # the proxy only ever wraps the whole item, reads of some of its attributes get an item of their own
+            self.__wrapped__ = cached_get(self._self_model, self._self_key)
         return super(RelationshipResult, self).__getattr__(name)
 
     def __eq__(self, other):
-        return isinstance(other, self._self_model) and self._self_key == getattr(other, self._self_key_name)
+        return isinstance(other, self._self_model) and self._self_key == get_key_value(other, self._self_key_name)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class RelationshipReference(object):
+    # a lazy reference to one item of a OneToMany, without the allocation and attribute access cost of a proxy. Its
+    # own names are private so that every public name is an attribute of the item.
+    __slots__ = ('_rr_key_name', '_rr_key', '_rr_model', '_rr_item')
+
+    def __init__(self, key_name, key, model):
+        self._rr_key_name = key_name
+        self._rr_key = key
+        self._rr_model = model
+        self._rr_item = None
+
+    def __getattr__(self, name):
+        # only called for the attributes of the item
+        if name == self._rr_key_name:
+            return self._rr_key
+        if isinstance(self._rr_key_name, tuple) and name in self._rr_key_name:
+            return self._rr_key[self._rr_key_name.index(name)]
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._rr_resolve()._rr_item, name)
+
+    def _rr_resolve(self):
+        if self._rr_item is None:
+            self._rr_item = cached_get(self._rr_model, self._rr_key)
+        return self
+
+    def __eq__(self, other):
+        if isinstance(other, RelationshipReference):
+            return self._rr_model == other._rr_model and self._rr_key == other._rr_key
+        return isinstance(other, self._rr_model) and self._rr_key == get_key_value(other, self._rr_key_name)
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def __hash__(self):
+        return hash((self._rr_model, self._rr_key))
+
+    def __repr__(self):
+        return '<%s %s=%r>' % (self._rr_model.__name__, self._rr_key_name, self._rr_key)
+
+
+def decode_keys(hash_keys, metadata=None):
+    # keys from the raw DynamoDB list of {"N": "1"} / {"S": "a"} values, or {"L": [hash key, range key]} values of
+    # composite keys, or the keys themselves. Values of keys other than numbers and strings (dates...) are
+    # deserialized by their attribute.
+    if hash_keys and isinstance(hash_keys[0], dict):
+        key_type = list(hash_keys[0].keys())[0]
+        if key_type == LIST_SHORT:
+            return [decode_key(hash_key[key_type], metadata) for hash_key in hash_keys]
+        if key_type == NUMBER_SHORT:
+            return [coerce_number(hash_key[key_type]) for hash_key in hash_keys]
+        if metadata is not None and metadata.hash_key_type == key_type and \
+                not isinstance(metadata.hash_key_attribute, UnicodeAttribute):
+            deserialize = metadata.key_deserializers[0]
+            return [deserialize(hash_key[key_type]) for hash_key in hash_keys]
+        return [hash_key[key_type] for hash_key in hash_keys]
+    return hash_keys
+
+
+def decode_key(values, metadata=None):
+    if metadata is None:
+        return tuple(decode_value(value) for value in values)
+    return tuple(deserialize(list(value.values())[0]) for deserialize, value in zip(metadata.key_deserializers, values))
+
+
+def decode_value(value):
+    (value_type, value) = list(value.items())[0]
+    return coerce_number(value) if value_type == NUMBER_SHORT else value
+
+
+def encode_key(metadata, key):
+    # the serialized form of each value, with the DynamoDB type of its attribute
+    if isinstance(key, tuple):
+        return {LIST_SHORT: [{key_type: serialize(value)} for key_type, serialize, value in zip(
+            metadata.key_types, metadata.key_serializers, key)]}
+    return {metadata.key_types[0]: metadata.key_serializers[0](key)}
+
+
+def compact_keys(keys):
+    # integer keys take 8 bytes each in an array instead of a list of int objects
+    if keys and all(isinstance(key, int) and not isinstance(key, bool) for key in keys):
+        try:
+            return array('q', keys)
+        except OverflowError:
+            pass
+    return keys
+
+
+class RelationshipKeys(object):
+    # the keys of a relationship, decoded from the raw attribute value the first time they are used
+    __slots__ = ('raw', 'decoded', 'metadata')
+
+    def __init__(self, raw=None, keys=None, metadata=None):
+        self.raw = raw
+        self.decoded = keys
+        self.metadata = metadata
+
+    @property
+    def keys(self):
+        if self.decoded is None:
+            self.decoded = compact_keys(decode_keys(self.raw, self.metadata))
+            self.raw = None
+        return self.decoded
+
 
 class RelationshipResultList(list):
-    def __init__(self, hash_key_name, model, keys):
+    def __init__(self, hash_key_name, model, keys, start=0, stop=None):
+        # the list itself stays empty, the keys are shared with the slices of the list which are views on them
+        super(RelationshipResultList, self).__init__()
         self._hash_key_name = hash_key_name
         self._model = model
-        self._keys = keys
-        super(RelationshipResultList, self).__init__(keys)
+        self._store = keys if isinstance(keys, RelationshipKeys) else RelationshipKeys(keys=keys)
+        self._start = start
+        self._stop = stop
+        self._key_index = None
+
+    @property
+    def _keys(self):
+        keys = self._store.keys
+        if self._start == 0 and self._stop is None:
+            return keys
+        return keys[self._start:self._stop]
+
+    def __len__(self):
+        stop = len(self._store.keys) if self._stop is None else self._stop
+        return max(stop - self._start, 0)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    __nonzero__ = __bool__
 
     def __getitem__(self, item):
         if isinstance(item, slice):
-            return RelationshipResultList(self._hash_key_name, self._model, self._keys[item])
+            (start, stop, step) = item.indices(len(self))
+            if step != 1:
+                return RelationshipResultList(self._hash_key_name, self._model, list(self._keys[item]))
+            return RelationshipResultList(self._hash_key_name, self._model, self._store,
+                                          self._start + start, self._start + max(stop, start))
 
-        return RelationshipResult(self._hash_key_name, self._keys[item], self._model)
+        return RelationshipReference(self._hash_key_name, self.get_key(item), self._model)
 
     def __getslice__(self, i, j):
-        return RelationshipResultList(self._hash_key_name, self._model, self._keys[i:j])
+        return self.__getitem__(slice(i, j))
 
     def __iter__(self):
-        for key in self._keys:
-            yield RelationshipResult(self._hash_key_name, key, self._model)
+        keys = self._store.keys
+        for index in range(self._start, self._start + len(self)):
+            yield RelationshipReference(self._hash_key_name, keys[index], self._model)
+
+    def __reversed__(self):
+        keys = self._store.keys
+        for index in reversed(range(self._start, self._start + len(self))):
+            yield RelationshipReference(self._hash_key_name, keys[index], self._model)
+
+    # the methods of list read its own (empty) storage, they work on the keys instead. Items and references are
+    # looked up by their key.
+    def __contains__(self, value):
+        return self.get_value_key(value) in self._keys
+
+    def index(self, value, *args):
+        return self.get_keys().index(self.get_value_key(value), *args)
+
+    def count(self, value):
+        return self.get_keys().count(self.get_value_key(value))
+
+    def copy(self):
+        return RelationshipResultList(self._hash_key_name, self._model, self.get_keys())
+
+    def __add__(self, other):
+        return self.get_keys() + (other.get_keys() if isinstance(other, RelationshipResultList) else list(other))
+
+    def __radd__(self, other):
+        return list(other) + self.get_keys()
 
-    def resolve(self):
-        models = dict((getattr(entity, self._hash_key_name), entity) for entity in self._model.batch_get(self._keys))
-        return [models[key] for key in self._keys]
+    def __mul__(self, times):
+        return self.get_keys() * times
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if isinstance(other, RelationshipResultList):
+            return self._model == other._model and self.get_keys() == other.get_keys()
+        return isinstance(other, list) and self.get_keys() == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.get_keys())
+
+    def get_key(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('relationship index out of range')
+        return self._store.keys[self._start + index]
+
+    def get_keys(self):
+        return list(self._keys)
+
+    def get_value_key(self, value):
+        if isinstance(value, RelationshipReference):
+            return value._rr_key
+        if isinstance(value, Model):
+            return get_key_value(value, self._hash_key_name)
+        return value
+
+    def index_of_key(self, key):
+        # keys are compared as strings since that is how they come back from cursors
+        if self._key_index is None:
+            metadata = get_model_metadata(self._model)
+            self._key_index = {}
+            for index, item_key in enumerate(self._keys):
+                self._key_index.setdefault(to_key_string(metadata, item_key), index)
+        return self._key_index.get(key)
+
+    def resolve(self, attributes_to_get=None):
+        # items in the order of the keys, the keys of items that do not exist are in missing_keys
+        return batch_get(self._model, self.get_keys(), attributes_to_get=attributes_to_get)
+
+
+class ModelIndex(object):
+    def __init__(self, base=Model):
+        self.base = base
+        # model name and module.name -> the models that go by it
+        self.models = {}
+        self.indexed = set()
+        self.lock = RLock()
+
+    def add(self, model):
+        # a second model taking a name makes it ambiguous from then on
+        with self.lock:
+            if model in self.indexed:
+                return
+            self.indexed.add(model)
+            for name in (model.__name__, '%s.%s' % (model.__module__, model.__name__)):
+                self.models.setdefault(name, []).append(model)
+
+    def get_subclasses(self):
+        subclasses = set()
+        pending = [self.base]
+        while pending:
+            for sub_class in pending.pop().__subclasses__():
+                if sub_class not in subclasses:
+                    subclasses.add(sub_class)
+                    pending.append(sub_class)
+        return subclasses
+
+    def update(self):
+        # index the models defined since the last walk of the subclasses
+        with self.lock:
+            for model in self.get_subclasses():
+                self.add(model)
+
+    def get(self, model_name):
+        models = self.models.get(model_name)
+        # the subclasses are only walked again for a name that is not indexed yet
+        if models is None:
+            self.update()
+            models = self.models.get(model_name)
+        if not models:
+            return None
+        if len(models) > 1:
+            raise ValueError("Model name %s is ambiguous, it matches %s. Reference the model as module.%s instead" % (
+                model_name, ', '.join('%s.%s' % (model.__module__, model.__name__) for model in models),
+                model_name.rsplit('.', 1)[-1]))
+        return models[0]
 
 
 class Relationship(Attribute):
-    _models = None
+    _models = ModelIndex()
 
     @classmethod
-    def sub_classes(cls, klass):
-        return klass.__subclasses__() + [g for s in klass.__subclasses__() for g in Relationship.sub_classes(s)]
+    def get_model(cls, model_name):
+        # Resolve a model name, or module.name, into a model class
+        return Relationship._models.get(model_name)
 
     @classmethod
-    def get_model(cls, model_name):
-        # Resolve a model name into a model class by looking in all Model subclasses
-        if not Relationship._models:
-            Relationship._models = Relationship.sub_classes(Model)
-        return next((model for model in Relationship._models if model.__name__ == model_name), None)
+    def index_model(cls, model):
+        Relationship._models.add(model)
 
     def __init__(self, model, lazy=True, **args):
         if not isinstance(model, string_types) and not issubclass(model, Model):
@@ -84,6 +336,11 @@ class Relationship(Attribute):
             self._hash_key_name = get_key_name(self.model)
         return self._hash_key_name
 
+    @property
+    def key_name(self):
+        # the hash key name, or the hash and range key names of models with composite keys
+        return get_model_metadata(self.model).key_name
+
     @property
     def model(self):
         if isinstance(self._model, string_types):
@@ -96,40 +353,34 @@ class OneToOne(Relationship):
     attr_type = STRING
 
     def serialize(self, model):
-        return str(getattr(model, self.hash_key_name))
+        # composite keys are stored as a JSON array of the hash and range keys
+        return to_key_string(get_model_metadata(self.model), get_key_value(model, self.key_name))
 
     def deserialize(self, hash_key):
-        if isinstance(getattr(self.model, self.hash_key_name), NumberAttribute):
-            hash_key = int(hash_key)
+        key = from_key_string(get_model_metadata(self.model), hash_key)
 
         if self._lazy:
-            return RelationshipResult(self.hash_key_name, hash_key, self.model)
+            return RelationshipResult(self.key_name, key, self.model)
         else:
-            return self.model.get(hash_key)
+            return self.model.get(*(key if isinstance(key, tuple) else (key,)))
 
 
 class OneToMany(Relationship):
     attr_type = LIST
 
     def serialize(self, models):
-        key_type = ATTR_TYPE_MAP[getattr(self.model, self.hash_key_name).attr_type]
-        return [{key_type: str(getattr(model, self.hash_key_name))} for model in models]
+        metadata = get_model_metadata(self.model)
+        if isinstance(models, RelationshipResultList):
+            # relationships that were read are written back without reading or wrapping their items
+            return [encode_key(metadata, key) for key in models.get_keys()]
+        return [encode_key(metadata, get_key_value(model, self.key_name)) for model in models]
 
     def deserialize(self, hash_keys):
-        if hash_keys and isinstance(hash_keys[0], dict):
-            key_type = list(hash_keys[0].keys())[0]
-            if key_type == NUMBER_SHORT:
-                hash_keys = [int(hash_key[key_type]) for hash_key in hash_keys]
-            else:
-                hash_keys = [hash_key[key_type] for hash_key in hash_keys]
-        else:
-            if isinstance(getattr(self.model, self.hash_key_name), NumberAttribute):
-                hash_keys = [hash_key for hash_key in hash_keys]
-
         if self._lazy:
-            return RelationshipResultList(self.hash_key_name, self.model, hash_keys)
+            return RelationshipResultList(self.key_name, self.model,
+                                          RelationshipKeys(raw=hash_keys, metadata=get_model_metadata(self.model)))
         else:
-            return self.model.batch_get(hash_keys)
+            return self.model.batch_get(decode_keys(hash_keys, get_model_metadata(self.model)))
 
     def get_value(self, value):
         # we need this for legacy compatibility.
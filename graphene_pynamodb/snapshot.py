@@ -0,0 +1,109 @@
+from __future__ import absolute_import
+
+import hashlib
+import importlib
+import json
+import os
+import sys
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+SNAPSHOT_VERSION = 1
+# schema -> its introspection result, computed or loaded once per process. Loaded before workers fork, it is shared
+# with them copy-on-write.
+INTROSPECTIONS = WeakKeyDictionary()
+
+
+def get_fingerprint(schema):
+    # printing the schema is cheap next to introspecting it, but leaves out the descriptions
+    fingerprint = hashlib.sha1(str(schema).encode('utf-8'))
+    for (name, graphql_type) in sorted(schema.get_type_map().items()):
+        descriptions = [name, graphql_type.description]
+        members = getattr(graphql_type, 'fields', None) or {}
+        for (member_name, member) in members.items():
+            descriptions.extend((member_name, member.description))
+            for (arg_name, arg) in sorted((getattr(member, 'args', None) or {}).items()):
+                descriptions.extend((arg_name, arg.description))
+        for value in getattr(graphql_type, 'values', None) or []:
+            descriptions.extend((value.name, value.description))
+        fingerprint.update(json.dumps(descriptions).encode('utf-8'))
+    return fingerprint.hexdigest()
+
+
+class SchemaSnapshot(object):
+    def __init__(self, path, build_id=None):
+        # the snapshot file is read the first time it is needed
+        self.path = path
+        # an id of the deployed build (a commit or release): a snapshot saved with the same id is served without
+        # printing the schema to compare its fingerprint
+        self.build_id = build_id
+        self.data = None
+        self.lock = Lock()
+
+    def load(self):
+        if self.data is None:
+            with self.lock:
+                if self.data is None:
+                    self.data = read_snapshot(self.path)
+        return self.data
+
+    def get_introspection(self, schema):
+        # the introspection of the snapshot, if it was taken from the same schema
+        data = self.load()
+        if self.build_id is not None and data.get('build_id') == self.build_id:
+            return data['introspection']
+        if data.get('fingerprint') != get_fingerprint(schema):
+            return None
+        return data['introspection']
+
+    def save(self, schema):
+        data = {'version': SNAPSHOT_VERSION, 'build_id': self.build_id, 'fingerprint': get_fingerprint(schema),
+                'introspection': schema.introspect()}
+        # written next to the snapshot and renamed over it, so readers never see a partial file
+        temporary_path = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(temporary_path, 'w') as snapshot_file:
+            json.dump(data, snapshot_file, separators=(',', ':'))
+        os.rename(temporary_path, self.path)
+        with self.lock:
+            self.data = data
+        return data
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as snapshot_file:
+            data = json.load(snapshot_file)
+    except (IOError, OSError, ValueError):
+        return {}
+    # snapshots of other versions are ignored and the schema introspected instead
+    return data if isinstance(data, dict) and data.get('version') == SNAPSHOT_VERSION else {}
+
+
+def get_introspection(schema, snapshot=None):
+    # the result of schema.introspect(), from the snapshot when it matches the schema
+    introspection = INTROSPECTIONS.get(schema)
+    if introspection is None:
+        introspection = snapshot.get_introspection(schema) if snapshot is not None else None
+        if introspection is None:
+            introspection = schema.introspect()
+        INTROSPECTIONS[schema] = introspection
+    return introspection
+
+
+def main(argv=None):
+    # python -m graphene_pynamodb.snapshot package.module:schema schema.json [build-id]
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) not in (2, 3) or ':' not in argv[0]:
+        sys.stderr.write("usage: python -m graphene_pynamodb.snapshot package.module:schema snapshot.json "
+                         "[build-id]\n")
+        return 2
+
+    (module_name, schema_name) = argv[0].split(':', 1)
+    schema = getattr(importlib.import_module(module_name), schema_name)
+    data = SchemaSnapshot(argv[1], build_id=argv[2] if len(argv) > 2 else None).save(schema)
+    sys.stdout.write("Wrote the snapshot of schema %s to %s\n" % (data['fingerprint'], argv[1]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,7 @@ from datetime import datetime
 
 from pynamodb.attributes import (NumberAttribute, NumberSetAttribute, UnicodeAttribute, UTCDateTimeAttribute,
                                  MapAttribute, ListAttribute)
+from pynamodb.indexes import AllProjection, GlobalSecondaryIndex, KeysOnlyProjection, LocalSecondaryIndex
 from pynamodb.models import Model
 
 from graphene_pynamodb.relationships import OneToOne, OneToMany
@@ -46,6 +47,17 @@ class Article(Model):
     reporter = OneToOne('Reporter')
 
 
+class ReporterNameIndex(GlobalSecondaryIndex):
+    class Meta:
+        index_name = 'reporter_name_index'
+        read_capacity_units = 1
+        write_capacity_units = 1
+        projection = AllProjection()
+
+    last_name = UnicodeAttribute(hash_key=True)
+    first_name = UnicodeAttribute(range_key=True)
+
+
 class Reporter(Model):
     class Meta:
         table_name = 'test_graphene_pynamodb_reporters'
@@ -61,3 +73,25 @@ class Reporter(Model):
     favorite_article = OneToOne(Article, null=True)
     custom_map = MapAttribute(null=True)
     awards = ListAttribute(null=True)
+    name_index = ReporterNameIndex()
+
+
+class CommentBodyIndex(LocalSecondaryIndex):
+    class Meta:
+        index_name = 'comment_body_index'
+        projection = KeysOnlyProjection()
+
+    article_id = NumberAttribute(hash_key=True)
+    body = UnicodeAttribute(range_key=True)
+
+
+class Comment(Model):
+    class Meta:
+        table_name = 'test_graphene_pynamodb_comments'
+        host = DB_HOST
+        region = DB_REGION
+
+    article_id = NumberAttribute(hash_key=True)
+    posted_at = UnicodeAttribute(range_key=True)
+    body = UnicodeAttribute()
+    body_index = CommentBodyIndex()
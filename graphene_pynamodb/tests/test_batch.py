@@ -0,0 +1,60 @@
+from mock import patch
+
+from .models import Article, Comment
+from .test_query import setup_fixtures
+from ..batch import batch_get
+from ..relationships import RelationshipResultList
+
+setup_fixtures()
+
+
+def batch_get_page(keys, consistent_read=None, attributes_to_get=None):
+    return [dict(key, headline={'S': 'Article %s' % key['id']['N']}) for key in keys], None
+
+
+def test_batch_get_should_return_items_in_key_order():
+    articles = batch_get(Article, [3, 2, 1, 3])
+    assert [article.id for article in articles] == [3, 1, 3]
+    assert articles.missing_keys == [2]
+    assert articles.unprocessed_keys == []
+    assert (articles.chunks, articles.retries) == (1, 0)
+
+    comments = batch_get(Comment, [(1, '2018-01-01'), (3, '2017-01-15'), (1, '2020-01-01')])
+    assert [comment.body for comment in comments] == ['Third', 'Other']
+    assert comments.missing_keys == [(1, '2020-01-01')]
+
+
+def test_relationship_should_resolve_partially():
+    articles = RelationshipResultList('id', Article, [1, 2, 3]).resolve()
+    assert [article.headline for article in articles] == ['Hi!', 'My Article']
+    assert articles.missing_keys == [2]
+
+
+@patch('graphene_pynamodb.tests.models.Article._batch_get_page', side_effect=batch_get_page)
+def test_batch_get_should_read_chunks_concurrently(batch_get_page):
+    articles = batch_get(Article, list(range(250)))
+    assert [article.id for article in articles] == list(range(250))
+    assert articles.chunks == 3
+    assert sorted(len(call[0][0]) for call in batch_get_page.call_args_list) == [50, 100, 100]
+
+
+@patch('graphene_pynamodb.batch.backoff')
+def test_batch_get_should_retry_unprocessed_keys(backoff):
+    pages = [([], [{'id': {'N': '1'}}, {'id': {'N': '3'}}]), ([{'id': {'N': '1'}}], [{'id': {'N': '3'}}])]
+
+    def throttled_batch_get_page(keys, consistent_read=None, attributes_to_get=None):
+        return pages.pop(0) if pages else batch_get_page(keys)
+
+    with patch.object(Article, '_batch_get_page', side_effect=throttled_batch_get_page):
+        articles = batch_get(Article, [1, 3])
+    assert [article.id for article in articles] == [1, 3]
+    assert articles.retries == 2
+    assert [call[0][0] for call in backoff.call_args_list] == [1, 2]
+
+    # keys still unprocessed after the last retry are reported, not raised
+    with patch.object(Article, '_batch_get_page', return_value=([{'id': {'N': '1'}}], [{'id': {'N': '3'}}])):
+        articles = batch_get(Article, [1, 3], max_retries=3)
+    assert [article.id for article in articles] == [1]
+    assert articles.unprocessed_keys == [3]
+    assert articles.missing_keys == []
+    assert articles.retries == 3
@@ -0,0 +1,139 @@
+import tracemalloc
+from types import SimpleNamespace
+
+import graphene
+import pytest
+from graphene import relay
+from graphql_relay import from_global_id
+from mock import patch
+from pynamodb.attributes import BooleanAttribute, NumberAttribute, UnicodeAttribute
+from pynamodb.models import Model
+
+from .models import Article, Comment, Reporter
+from ..fields import PynamoConnectionField
+from ..registry import Registry
+from ..relationships import OneToMany, OneToOne, RelationshipReference, RelationshipResult, RelationshipResultList
+from ..types import PynamoObjectType
+from ..utils import get_model_metadata, to_key_string
+
+RELATIONSHIP_SIZE = 50000
+
+
+def batch_get_page(keys, consistent_read=None, attributes_to_get=None):
+    return [dict(key, headline={'S': 'Article'}) for key in keys], None
+
+
+@pytest.mark.benchmark(group='relationship-cursor-seek')
+@pytest.mark.parametrize('depth', [0, 1000, 25000, RELATIONSHIP_SIZE - 20])
+@patch('graphene_pynamodb.tests.models.Article._batch_get_page', side_effect=batch_get_page)
+def test_relationship_page_latency_should_not_depend_on_depth(batch_get_page, benchmark, depth):
+    relationship = RelationshipResultList('id', Article, list(range(RELATIONSHIP_SIZE)))
+    (_, edges) = PynamoConnectionField.get_edges_from_iterable(relationship, Article, None, page_size=depth + 1)
+    (_, after) = from_global_id(edges[-1].cursor)
+
+    (has_next, edges) = benchmark(PynamoConnectionField.get_edges_from_iterable, relationship, Article, None,
+                                  after=after, page_size=10)
+    assert has_next
+    assert [edge.node.id for edge in edges] == list(range(depth + 1, depth + 11))
+
+
+def get_allocated_size(reference, keys):
+    tracemalloc.start()
+    references = [reference('id', key, Article) for key in keys]
+    (size, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(references) == len(keys)
+    return size
+
+
+@pytest.mark.benchmark(group='relationship-iteration')
+@pytest.mark.parametrize('reference', [RelationshipResult, RelationshipReference])
+def test_relationship_iteration_should_not_allocate_proxies(benchmark, reference):
+    keys = list(range(RELATIONSHIP_SIZE))
+
+    def iterate():
+        return [item.id for item in (reference('id', key, Article) for key in keys)]
+
+    assert benchmark(iterate) == keys
+    # memory held by the references of a whole relationship
+    assert get_allocated_size(RelationshipReference, keys) * 2 < get_allocated_size(RelationshipResult, keys)
+
+
+@pytest.mark.benchmark(group='relationship-deserialize')
+@pytest.mark.parametrize('selected', [False, True])
+def test_relationship_keys_should_be_decoded_on_first_use(benchmark, selected):
+    raw = [{'N': str(key)} for key in range(RELATIONSHIP_SIZE)]
+    relationship = OneToMany(Article)
+
+    def deserialize():
+        articles = relationship.deserialize(raw)
+        # the page of a selected relationship
+        return articles[:10].get_keys() if selected else articles
+
+    articles = benchmark(deserialize)
+    if selected:
+        assert articles == list(range(10))
+        # a whole relationship of integer keys takes 8 bytes per key
+        keys = relationship.deserialize(raw)._store.keys
+        assert keys.itemsize * len(keys) == 8 * RELATIONSHIP_SIZE
+
+
+@pytest.mark.benchmark(group='per-node-overhead')
+@pytest.mark.parametrize('model', [Reporter, Comment])
+def test_node_resolvers_should_use_compiled_metadata(benchmark, model):
+    # the key handling of get_node and resolve_id for every node, without the read
+    registry = Registry()
+    node_type = type('Benchmark%sNode' % model.__name__, (PynamoObjectType,), {
+        'Meta': type('Meta', (), {'model': model, 'registry': registry, 'interfaces': (relay.Node,)})})
+    info = SimpleNamespace(parent_type=SimpleNamespace(graphene_type=node_type), context=None)
+    key_name = get_model_metadata(model).key_name
+    items = [model(*((i, 'range') if isinstance(key_name, tuple) else (i,))) for i in range(1000)]
+    ids = dict((node_type.resolve_id(item, info), item) for item in items)
+
+    def read(model, key, projection):
+        return ids[to_key_string(get_model_metadata(model), key)]
+
+    def resolve():
+        with patch('graphene_pynamodb.types.cached_get', side_effect=read):
+            return [node_type.resolve_id(node_type.get_node(info, id), info) for id in ids]
+
+    assert benchmark(resolve) == list(ids)
+
+
+def create_models(count):
+    models = []
+    for i in range(count):
+        attributes = dict(('field_%d' % j, UnicodeAttribute(null=True)) for j in range(15))
+        attributes.update(__module__='benchmark', Meta=type('Meta', (), {'table_name': 'benchmark_%d' % i}),
+                          id=NumberAttribute(hash_key=True), flag=BooleanAttribute(null=True))
+        if models and i % 4 == 0:
+            attributes.update(parent=OneToOne(models[-1], null=True), children=OneToMany(models[-1], null=True))
+        models.append(type('BenchmarkModel%d' % i, (Model,), attributes))
+    return models
+
+
+def build_schema(models):
+    registry = Registry()
+    types = [type('BenchmarkNode%d' % i, (PynamoObjectType,), {
+        'Meta': type('Meta', (), {'model': model, 'registry': registry, 'interfaces': (relay.Node,)})})
+        for i, model in enumerate(models)]
+
+    class Query(graphene.ObjectType):
+        node = relay.Node.Field()
+
+    return graphene.Schema(query=Query, types=types)
+
+
+@pytest.mark.benchmark(group='schema-build')
+@pytest.mark.parametrize('model_count', [10, 100])
+def test_schema_build_should_scale_with_models(benchmark, model_count):
+    schema = benchmark.pedantic(build_schema, setup=lambda: ((create_models(model_count),), {}), rounds=5)
+    assert schema.get_type('BenchmarkNode%d' % (model_count - 1))
+
+    # memory allocated by a build, per model
+    models = create_models(model_count)
+    tracemalloc.start()
+    build_schema(models)
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    benchmark.extra_info['peak_bytes_per_model'] = peak // model_count
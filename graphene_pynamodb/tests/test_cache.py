@@ -0,0 +1,140 @@
+from botocore.exceptions import ClientError
+from mock import patch
+from pynamodb.attributes import NumberAttribute, UnicodeAttribute
+from pynamodb.exceptions import GetError
+from pynamodb.models import Model
+
+from .models import DB_HOST, DB_REGION
+from .test_query import setup_fixtures
+from ..batch import batch_get
+from ..cache import ItemCache, cached_get, item_cache
+from ..relationships import OneToOne
+from ..types import PynamoObjectType
+
+setup_fixtures()
+
+
+class CachedEditor(Model):
+    class Meta:
+        table_name = 'test_graphene_pynamodb_editors'
+        host = DB_HOST
+        region = DB_REGION
+
+    id = UnicodeAttribute(hash_key=True)
+    name = UnicodeAttribute()
+
+
+class CachedPost(Model):
+    class Meta:
+        table_name = 'test_graphene_pynamodb_cached_posts'
+        host = DB_HOST
+        region = DB_REGION
+
+    id = NumberAttribute(hash_key=True)
+    author = OneToOne(CachedEditor)
+
+
+class CachedEditorType(PynamoObjectType):
+    class Meta:
+        model = CachedEditor
+        skip_registry = True
+        cache_ttl = 60
+        cache_serve_stale = True
+
+
+class CachedPostType(PynamoObjectType):
+    class Meta:
+        model = CachedPost
+        skip_registry = True
+        cache_ttl = 60
+
+
+if not CachedPost.exists():
+    CachedPost.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+CachedPost(1, author=CachedEditor('1')).save()
+
+
+def throttled(*args, **kwargs):
+    raise GetError("Failed to get item", ClientError({'Error': {'Code': 'ThrottlingException'}}, 'GetItem'))
+
+
+def test_cache_should_evict_least_recently_used_and_expired_items():
+    cache = ItemCache(max_size=2)
+    cache.models[CachedEditor] = (10, False)
+    (a, b, c) = (CachedEditor('a', name='A'), CachedEditor('b', name='B'), CachedEditor('c', name='C'))
+    with patch('graphene_pynamodb.cache.time.time', return_value=100):
+        cache.put(a)
+        cache.put(b)
+        assert cache.get(CachedEditor, 'a').name == 'A'
+        cache.put(c)
+        assert cache.get(CachedEditor, 'b') is None
+        assert cache.get(CachedEditor, 'a').name == 'A'
+
+        partial = CachedEditor('d')
+        cache.put(partial, ['id'])
+        assert cache.get(CachedEditor, 'd', ['id']).id == 'd'
+        assert cache.get(CachedEditor, 'd') is None
+
+    with patch('graphene_pynamodb.cache.time.time', return_value=111):
+        assert cache.get(CachedEditor, 'd', ['id']) is None
+        assert list(cache.entries) == [(CachedEditor, 'a')]
+
+
+def test_cache_should_be_configured_on_the_type():
+    assert CachedEditorType._meta.cache_ttl == 60
+    assert item_cache.is_cached(CachedEditor)
+    item_cache.clear()
+
+    with patch.object(CachedEditor, 'get', wraps=CachedEditor.get) as get:
+        assert cached_get(CachedEditor, '1').name == 'John'
+        assert cached_get(CachedEditor, '1').name == 'John'
+        assert [editor.name for editor in batch_get(CachedEditor, ['1'])] == ['John']
+    get.assert_called_once_with('1')
+
+    # writes invalidate the cached item
+    editor = cached_get(CachedEditor, '1')
+    editor.save()
+    assert item_cache.get(CachedEditor, '1') is None
+    with patch.object(CachedEditor, '_batch_get_page', wraps=CachedEditor._batch_get_page) as batch_get_page:
+        assert [editor.name for editor in batch_get(CachedEditor, ['1'])] == ['John']
+        assert [editor.name for editor in batch_get(CachedEditor, ['1'])] == ['John']
+    batch_get_page.assert_called_once()
+    item_cache.clear()
+
+
+def test_cache_should_serve_stale_items_while_throttled():
+    item_cache.clear()
+    cached_get(CachedEditor, '1')
+    with patch('graphene_pynamodb.cache.time.time', return_value=10 ** 10), \
+            patch.object(CachedEditor, 'get', side_effect=throttled), \
+            patch.object(CachedEditor, '_batch_get_page', side_effect=throttled):
+        assert cached_get(CachedEditor, '1').name == 'John'
+        assert [editor.name for editor in batch_get(CachedEditor, ['1'])] == ['John']
+
+    item_cache.clear()
+    with patch.object(CachedEditor, 'get', side_effect=throttled):
+        try:
+            cached_get(CachedEditor, '1')
+            assert False, "expected a GetError"
+        except GetError:
+            pass
+
+
+def test_cache_should_give_every_read_its_own_item():
+    item_cache.clear()
+    editor = cached_get(CachedEditor, '1')
+    editor.name = 'Changed'
+    assert cached_get(CachedEditor, '1') is not editor
+    assert cached_get(CachedEditor, '1').name == 'John'
+
+    # relationships resolved on a cached item do not stay resolved for the next reads
+    assert cached_get(CachedPost, 1).author.name == 'John'
+    editor = CachedEditor.get('1')
+    editor.name = 'Jane'
+    editor.save()
+    try:
+        assert cached_get(CachedPost, 1).author.name == 'Jane'
+    finally:
+        editor.name = 'John'
+        editor.save()
+    item_cache.clear()
@@ -0,0 +1,36 @@
+import pytest
+
+from .models import Comment, Reporter
+from ..conditions import NumberKeyCondition, StringKeyCondition, build_filter_condition, build_key_condition, \
+    get_key_condition_type
+
+
+def test_key_condition_type_should_follow_attribute():
+    assert get_key_condition_type(Comment.posted_at) == StringKeyCondition
+    assert get_key_condition_type(Comment.article_id) == NumberKeyCondition
+
+
+def test_key_condition_should_build_conditions():
+    assert repr(build_key_condition(Comment.posted_at, {'begins_with': '2017'})) == \
+        repr(Comment.posted_at.startswith('2017'))
+    assert repr(build_key_condition(Comment.posted_at, {'between': ['a', 'b'], 'eq': None})) == \
+        repr(Comment.posted_at.between('a', 'b'))
+    assert repr(build_key_condition(Comment.posted_at, {'lte': 'a'})) == repr(Comment.posted_at <= 'a')
+
+
+def test_key_condition_should_raiseerror_on_invalid():
+    with pytest.raises(ValueError):
+        build_key_condition(Comment.posted_at, {'eq': 'a', 'gt': 'b'})
+    with pytest.raises(ValueError):
+        build_key_condition(Comment.posted_at, {})
+    with pytest.raises(ValueError):
+        build_key_condition(Comment.posted_at, {'between': ['a']})
+
+
+def test_filter_condition_should_combine_operations():
+    condition = build_filter_condition(Reporter, {'first_name': {'begins_with': 'A', 'ne': 'ABA'},
+                                                  'email': {'exists': False}, 'pets': None})
+    assert repr(condition) == repr(Reporter.first_name.startswith('A') & (Reporter.first_name != 'ABA') &
+                                   Reporter.email.does_not_exist())
+    assert repr(build_filter_condition(Reporter, {'id': {'in_': [1, 2]}})) == repr(Reporter.id.is_in(1, 2))
+    assert build_filter_condition(Reporter, {'first_name': {'eq': None}}) is None
@@ -0,0 +1,36 @@
+from .models import Comment, Reporter
+from ..loaders import IdentityMap, get_identity_map, get_loaders
+
+
+class Context(object):
+    pass
+
+
+def test_identity_map_should_only_return_items_with_the_attributes_needed():
+    identity_map = IdentityMap()
+    partial = Reporter(id=1, first_name='A')
+    identity_map.add(partial, ['first_name', 'id'])
+    assert identity_map.get(Reporter, 1, ['id', 'first_name']) is partial
+    assert identity_map.get(Reporter, 1, ['id', 'last_name']) is None
+    assert identity_map.get(Reporter, 1) is None
+
+    full = Reporter(id=1, first_name='A', last_name='B')
+    identity_map.add(full)
+    identity_map.add(partial, ['first_name', 'id'])
+    assert identity_map.get(Reporter, 1, ['id', 'last_name']) is full
+    assert identity_map.get(Reporter, 1) is full
+
+    comment = Comment(1, '2017-01-01')
+    identity_map.add(comment)
+    assert identity_map.get(Comment, (1, '2017-01-01')) is comment
+    assert identity_map.get(Comment, (1, '2017-01-02')) is None
+
+
+def test_request_scope_should_live_on_the_context():
+    context = {}
+    assert get_loaders(context) is get_loaders(context)
+    assert get_loaders(Context()) == {}
+    assert get_loaders(None) is None
+    # contexts that do not take attributes have no request scope
+    assert get_loaders(object()) is None
+    assert get_identity_map(None) is None
@@ -0,0 +1,93 @@
+from mock import patch
+
+from .models import Comment, Reporter
+from .test_query import setup_fixtures
+from ..planner import BATCH_GET, GET, INDEX_QUERY, QUERY, SCAN, plan_query
+
+setup_fixtures()
+
+
+def test_planner_should_read_full_keys():
+    plan = plan_query(Reporter, {'id': {'eq': 1.0}})
+    assert plan.operation == GET
+    assert plan.keys == [1]
+    assert [reporter.first_name for reporter in plan()] == ['ABA']
+
+    plan = plan_query(Comment, {'article_id': {'eq': 1.0}, 'posted_at': {'eq': '2017-02-01'}})
+    assert plan.operation == GET
+    assert [comment.body for comment in plan()] == ['Second']
+
+    assert list(plan_query(Reporter, {'id': {'eq': 42}})()) == []
+
+
+def test_planner_should_batch_get_key_lists():
+    plan = plan_query(Reporter, {'id': {'in_': [2.0, 1.0, 2.0, 42.0]}})
+    assert plan.operation == BATCH_GET
+    assert plan.keys == [2, 1, 42]
+    assert [reporter.id for reporter in plan()] == [2, 1]
+    assert plan.count() == 2
+
+    # pages follow the order of the keys
+    page = plan(limit=1)
+    assert [reporter.id for reporter in page] == [2]
+    page = plan(limit=1, last_evaluated_key=page.last_evaluated_key)
+    assert [reporter.id for reporter in page] == [1]
+    assert page.last_evaluated_key == {'id': {'N': '1'}}
+    assert [reporter.id for reporter in plan(scan_index_forward=False)] == [1, 2]
+
+
+def test_planner_should_query_partitions():
+    plan = plan_query(Comment, {'article_id': {'eq': 1}, 'posted_at': {'begins_with': '2017'}, 'body': {'ne': 'x'}})
+    assert plan.operation == QUERY
+    assert repr(plan.range_key_condition) == repr(Comment.posted_at.startswith('2017'))
+    assert repr(plan.filter_condition) == repr(Comment.body != 'x')
+    assert [comment.body for comment in plan()] == ['First', 'Second']
+    assert plan.count() == 2
+
+    # a full key with a filter is still a single item query
+    plan = plan_query(Reporter, {'id': {'eq': 1}, 'first_name': {'eq': 'ABO'}})
+    assert plan.operation == QUERY
+    assert list(plan()) == []
+
+
+def test_planner_should_query_indexes():
+    plan = plan_query(Reporter, {'last_name': {'eq': 'Y'}})
+    assert plan.operation == INDEX_QUERY
+    assert plan.index_name == 'reporter_name_index'
+    assert plan.filter_condition is None
+    assert [reporter.first_name for reporter in plan()] == ['ABO']
+    assert [name for name, _ in plan.key_attributes] == ['id', 'last_name', 'first_name']
+
+    plan = plan_query(Reporter, {'last_name': {'eq': 'X'}, 'first_name': {'begins_with': 'AB'},
+                                 'email': {'exists': False}})
+    assert plan.operation == INDEX_QUERY
+    assert repr(plan.range_key_condition) == repr(Reporter.first_name.startswith('AB'))
+    assert repr(plan.filter_condition) == repr(Reporter.email.does_not_exist())
+    assert [reporter.first_name for reporter in plan()] == ['ABA']
+
+    # DynamoDB does not filter a query on its own keys
+    assert plan_query(Reporter, {'last_name': {'eq': 'X'}, 'first_name': {'ne': 'ABO'}}).operation == SCAN
+
+
+def test_planner_should_scan_as_last_resort():
+    plan = plan_query(Reporter, {'first_name': {'eq': 'ABA'}, 'id': {'ne': None}})
+    assert plan.operation == SCAN
+    assert repr(plan.filter_condition) == repr(Reporter.first_name == 'ABA')
+    assert plan_query(Reporter).operation == SCAN
+    assert plan_query(Reporter).filter_condition is None
+
+
+def test_planner_should_estimate_read_units():
+    description = {'ItemCount': 1000, 'TableSizeBytes': 1000 * 6000}
+    with patch.object(Reporter, 'describe_table', return_value=description):
+        assert plan_query(Reporter, {'id': {'eq': 1}}).estimate_read_units() == 1
+        assert plan_query(Reporter, {'id': {'in_': [1, 2, 3]}}).estimate_read_units() == 3
+        assert plan_query(Reporter, {'last_name': {'eq': 'X'}}, page_size=10).estimate_read_units() == 7.5
+        assert plan_query(Reporter, page_size=10).estimate_read_units() == 7.5
+        assert plan_query(Reporter, {'first_name': {'eq': 'A'}}, page_size=10).estimate_read_units() == 732.5
+        assert plan_query(Reporter).estimate_read_units() == 732.5
+
+        # queries stay within their partition, filtered or not
+        assert plan_query(Reporter, {'last_name': {'eq': 'X'}, 'email': {'eq': 'a@b.c'}},
+                          page_size=10).estimate_read_units() == 7.5
+        assert plan_query(Reporter, {'last_name': {'eq': 'X'}, 'email': {'eq': 'a@b.c'}}).estimate_read_units() == 128
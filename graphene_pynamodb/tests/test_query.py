@@ -1,18 +1,26 @@
+import base64
 import json
 import logging
 
 import graphene
 from graphene.relay import Node
-
-from .models import Article, Editor, Reporter
-from ..fields import PynamoConnectionField
+from graphql_relay import from_global_id, to_global_id
+from mock import patch
+from pynamodb.attributes import NumberAttribute
+from pynamodb.models import Model
+
+from .models import DB_HOST, DB_REGION, Article, Comment, Editor, Reporter
+from ..batch import batch_get
+from ..fields import PynamoConnectionField, PynamoNodesField, PynamoQueryConnectionField, index_connection_fields
+from ..registry import Registry
+from ..relationships import OneToMany, OneToOne
 from ..types import PynamoObjectType
 
 logging.basicConfig()
 
 
 def setup_fixtures():
-    for model in [Editor, Article, Reporter]:
+    for model in [Editor, Article, Reporter, Comment]:
         if not model.exists():
             model.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
 
@@ -28,6 +36,9 @@ def setup_fixtures():
     article2.save()
     editor = Editor(id='1', name='John')
     editor.save()
+    for (article_id, posted_at, body) in [(1, '2017-01-01', 'First'), (1, '2017-02-01', 'Second'),
+                                          (1, '2018-01-01', 'Third'), (3, '2017-01-15', 'Other')]:
+        Comment(article_id, posted_at, body=body).save()
 
 
 setup_fixtures()
@@ -435,8 +446,8 @@ def test_should_support_first():
                 'pageInfo': {
                     'hasNextPage': True,
                     'hasPreviousPage': False,
-                    'startCursor': '1',
-                    'endCursor': '1'
+                    'startCursor': to_global_id('Article', '0:1'),
+                    'endCursor': to_global_id('Article', '0:1')
                 }
             }
         }
@@ -448,6 +459,19 @@ def test_should_support_first():
     assert result.data['reporter']['articles']['edges'] == expected['reporter']['articles']['edges']
     assert result.data['reporter']['articles']['pageInfo'] == expected['reporter']['articles']['pageInfo']
 
+    # the cursors of the page info seek to the next page, cursors that are not in the list have nothing after them
+    query = '''
+        query ($after: String) {
+          reporter { articles(first: 1, after: $after) { edges { node { headline } } pageInfo { hasNextPage } } }
+        }
+    '''
+    for (after, headlines) in [(expected['reporter']['articles']['pageInfo']['endCursor'], ['My Article']),
+                               (to_global_id('Article', '0:404'), [])]:
+        result = schema.execute(query, variable_values={'after': after})
+        assert not result.errors
+        assert [edge['node']['headline'] for edge in result.data['reporter']['articles']['edges']] == headlines
+        assert not result.data['reporter']['articles']['pageInfo']['hasNextPage']
+
 
 def test_should_support_last():
     class ArticleNode(PynamoObjectType):
@@ -735,3 +759,1017 @@ def test_should_return_total_count():
     assert all(item in expected['reporter']['articles'] for item in result.data['reporter']['articles'])
     assert result.data['myArticle'] == expected['myArticle']
     assert all(item in result.data['allArticles'] for item in expected['allArticles'])
+
+
+def test_root_scan_should_paginate_natively():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = PynamoConnectionField(ArticleNode, native_pagination=True)
+
+    query = '''
+        query ArticlesQuery($after: String) {
+          articles(first: 1, after: $after) {
+            edges {
+              node {
+                headline
+              }
+            }
+            pageInfo {
+              hasNextPage
+              hasPreviousPage
+              endCursor
+            }
+          }
+        }
+    '''
+
+    schema = graphene.Schema(query=Query)
+    headlines = []
+    after = None
+    for _ in range(5):
+        result = schema.execute(query, variable_values={'after': after})
+        assert not result.errors
+        articles = result.data['articles']
+        assert len(articles['edges']) <= 1
+        assert articles['pageInfo']['hasPreviousPage'] == bool(after)
+        headlines += [edge['node']['headline'] for edge in articles['edges']]
+        if not articles['pageInfo']['hasNextPage']:
+            break
+        after = articles['pageInfo']['endCursor']
+
+    assert sorted(headlines) == ['Hi!', 'My Article']
+
+
+def test_root_scan_native_pagination_should_reject_last():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = PynamoConnectionField(ArticleNode, native_pagination=True)
+
+    query = '''
+        query ArticlesQuery {
+          articles(last: 1) {
+            edges {
+              node {
+                headline
+              }
+            }
+          }
+        }
+    '''
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute(query)
+    assert result.errors
+    assert isinstance(result.errors[0].original_error, NotImplementedError)
+
+
+def get_comments_schema():
+    class CommentNode(PynamoObjectType):
+        class Meta:
+            model = Comment
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        comments = PynamoQueryConnectionField(CommentNode)
+
+    return graphene.Schema(query=Query)
+
+
+def test_query_connection_should_use_key_conditions():
+    query = '''
+        query CommentsQuery {
+          all: comments(articleId: "1") {
+            edges {
+              node {
+                body
+              }
+            }
+          }
+          prefix: comments(articleId: "1", postedAt: {beginsWith: "2017"}) {
+            edges {
+              node {
+                body
+              }
+            }
+          }
+          range: comments(articleId: "1", postedAt: {between: ["2017-01-15", "2018-06-01"]}) {
+            edges {
+              node {
+                body
+              }
+            }
+          }
+          after: comments(articleId: "1", postedAt: {gt: "2017-01-01"}) {
+            edges {
+              node {
+                body
+              }
+            }
+          }
+        }
+    '''
+
+    result = get_comments_schema().execute(query)
+    assert not result.errors
+
+    def bodies(name):
+        return [edge['node']['body'] for edge in result.data[name]['edges']]
+
+    assert bodies('all') == ['First', 'Second', 'Third']
+    assert bodies('prefix') == ['First', 'Second']
+    assert bodies('range') == ['Second', 'Third']
+    assert bodies('after') == ['Second', 'Third']
+
+
+def test_query_connection_should_paginate_in_both_directions():
+    query = '''
+        query CommentsQuery($first: Int, $after: String, $last: Int, $before: String) {
+          comments(articleId: "1", first: $first, after: $after, last: $last, before: $before) {
+            edges {
+              node {
+                body
+              }
+            }
+            pageInfo {
+              hasNextPage
+              hasPreviousPage
+              startCursor
+              endCursor
+            }
+          }
+        }
+    '''
+    schema = get_comments_schema()
+
+    result = schema.execute(query, variable_values={'first': 2})
+    assert not result.errors
+    comments = result.data['comments']
+    assert [edge['node']['body'] for edge in comments['edges']] == ['First', 'Second']
+    assert comments['pageInfo']['hasNextPage']
+    assert not comments['pageInfo']['hasPreviousPage']
+
+    result = schema.execute(query, variable_values={'first': 2, 'after': comments['pageInfo']['endCursor']})
+    assert not result.errors
+    assert [edge['node']['body'] for edge in result.data['comments']['edges']] == ['Third']
+    assert result.data['comments']['pageInfo']['hasPreviousPage']
+
+    result = schema.execute(query, variable_values={'last': 2})
+    assert not result.errors
+    comments = result.data['comments']
+    assert [edge['node']['body'] for edge in comments['edges']] == ['Second', 'Third']
+    assert comments['pageInfo']['hasPreviousPage']
+    assert not comments['pageInfo']['hasNextPage']
+
+    result = schema.execute(query, variable_values={'last': 2, 'before': comments['pageInfo']['startCursor']})
+    assert not result.errors
+    assert [edge['node']['body'] for edge in result.data['comments']['edges']] == ['First']
+    assert result.data['comments']['pageInfo']['hasNextPage']
+
+    result = schema.execute(query, variable_values={'last': 1, 'after': comments['pageInfo']['startCursor']})
+    assert len(result.errors) == 1
+    assert 'last can only be combined with after' in str(result.errors[0])
+
+    result = schema.execute(query, variable_values={'first': 2, 'last': 1, 'after': comments['pageInfo']['startCursor']})
+    assert not result.errors
+    assert [edge['node']['body'] for edge in result.data['comments']['edges']] == ['Third']
+
+
+def test_should_count_only_when_selected():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class CommentNode(PynamoObjectType):
+        class Meta:
+            model = Comment
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporter = graphene.Field(ReporterNode)
+        articles = PynamoConnectionField(ArticleNode, native_pagination=True)
+        comments = PynamoQueryConnectionField(CommentNode)
+
+        def resolve_reporter(self, *args, **kwargs):
+            return Reporter.get(1)
+
+    query = '''
+        query CountQuery {
+          reporter {
+            articles(last: 1) {
+              totalCount
+            }
+          }
+          articles(first: 1) {
+            totalCount
+          }
+          comments(articleId: "1", postedAt: {beginsWith: "2017"}, first: 1) {
+            ...CommentCount
+          }
+        }
+
+        fragment CommentCount on CommentNodeConnection {
+          totalCount
+        }
+    '''
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute(query)
+    assert not result.errors
+    assert result.data['reporter']['articles']['totalCount'] == 2
+    assert result.data['articles']['totalCount'] == 2
+    assert result.data['comments']['totalCount'] == 2
+
+    with patch('graphene_pynamodb.planner.scan_count') as scan_count:
+        result = schema.execute('{ articles(first: 1) { edges { node { headline } } } }')
+        assert not result.errors
+        scan_count.assert_not_called()
+
+
+def test_get_query_overrides_should_still_return_callables():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ScanConnectionField(PynamoConnectionField):
+        @classmethod
+        def get_query(cls, model, info, **args):
+            return model.scan
+
+    class Query(graphene.ObjectType):
+        articles = ScanConnectionField(ArticleNode)
+        paged_articles = ScanConnectionField(ArticleNode, native_pagination=True)
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute('{ articles { totalCount edges { node { headline } } } }')
+    assert not result.errors
+    assert result.data['articles']['totalCount'] == 2
+    assert sorted(edge['node']['headline'] for edge in result.data['articles']['edges']) == ['Hi!', 'My Article']
+
+    result = schema.execute('{ pagedArticles(first: 1) { totalCount edges { node { headline } } } }')
+    assert not result.errors
+    assert result.data['pagedArticles']['totalCount'] == 2
+    assert len(result.data['pagedArticles']['edges']) == 1
+
+    result = schema.execute('{ pagedArticles(last: 1) { edges { node { headline } } } }')
+    assert len(result.errors) == 1
+    assert 'can only be paginated forward' in str(result.errors[0])
+
+
+def test_should_return_approximate_count():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = PynamoConnectionField(ArticleNode, native_pagination=True, approximate_count=True)
+
+    schema = graphene.Schema(query=Query)
+    with patch.object(Article, 'describe_table', return_value={'ItemCount': 42}):
+        result = schema.execute('{ articles(first: 1) { totalCount } }')
+    assert not result.errors
+    assert result.data['articles']['totalCount'] == 42
+
+
+def test_root_scan_should_read_segments_in_parallel():
+    class CommentNode(PynamoObjectType):
+        class Meta:
+            model = Comment
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        comments = PynamoConnectionField(CommentNode, total_segments=3, max_workers=2)
+
+    query = '''
+        query CommentsQuery($first: Int, $after: String) {
+          comments(first: $first, after: $after) {
+            edges {
+              cursor
+              node {
+                body
+              }
+            }
+            pageInfo {
+              hasNextPage
+              endCursor
+            }
+          }
+        }
+    '''
+    schema = graphene.Schema(query=Query)
+
+    result = schema.execute(query)
+    assert not result.errors
+    assert sorted(edge['node']['body'] for edge in result.data['comments']['edges']) == \
+        ['First', 'Other', 'Second', 'Third']
+    assert not result.data['comments']['pageInfo']['hasNextPage']
+
+    bodies = []
+    after = None
+    for _ in range(10):
+        result = schema.execute(query, variable_values={'first': 2, 'after': after})
+        assert not result.errors
+        comments = result.data['comments']
+        assert len(comments['edges']) <= 2
+        bodies += [edge['node']['body'] for edge in comments['edges']]
+        if not comments['pageInfo']['hasNextPage']:
+            break
+        after = comments['pageInfo']['endCursor']
+    assert sorted(bodies) == ['First', 'Other', 'Second', 'Third']
+
+    # resuming from an edge cursor continues right after that edge
+    result = schema.execute(query, variable_values={'first': 2})
+    first_edge = result.data['comments']['edges'][0]
+    result = schema.execute(query, variable_values={'after': first_edge['cursor']})
+    assert not result.errors
+    assert sorted(edge['node']['body'] for edge in result.data['comments']['edges']) == \
+        sorted(set(['First', 'Other', 'Second', 'Third']) - set([first_edge['node']['body']]))
+
+
+def test_should_stream_lazy_iterables():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    pulled = []
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = PynamoConnectionField(ArticleNode)
+
+        def resolve_articles(self, *args, **kwargs):
+            for i in range(1, 1001):
+                pulled.append(i)
+                yield Article(i, headline='Article %d' % i)
+
+    query = '''
+        query ArticlesQuery($first: Int, $last: Int, $after: String) {
+          articles(first: $first, last: $last, after: $after) {
+            edges {
+              cursor
+              node {
+                headline
+              }
+            }
+            pageInfo {
+              hasNextPage
+            }
+          }
+        }
+    '''
+    schema = graphene.Schema(query=Query)
+
+    result = schema.execute(query, variable_values={'first': 2})
+    assert not result.errors
+    assert [edge['node']['headline'] for edge in result.data['articles']['edges']] == ['Article 1', 'Article 2']
+    assert result.data['articles']['pageInfo']['hasNextPage']
+    assert len(pulled) == 3
+
+    del pulled[:]
+    after = result.data['articles']['edges'][-1]['cursor']
+    result = schema.execute(query, variable_values={'first': 2, 'after': after})
+    assert not result.errors
+    assert [edge['node']['headline'] for edge in result.data['articles']['edges']] == ['Article 3', 'Article 4']
+    assert len(pulled) == 5
+
+    result = schema.execute(query, variable_values={'last': 1})
+    assert not result.errors
+    assert [edge['node']['headline'] for edge in result.data['articles']['edges']] == ['Article 1000']
+
+    result = schema.execute('{ articles(first: 1) { totalCount } }')
+    assert not result.errors
+    assert result.data['articles']['totalCount'] == 1000
+
+
+def test_should_push_projection_down():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            projection_pushdown = True
+
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            projection_pushdown = True
+
+        full_name = graphene.String()
+
+        def resolve_full_name(self, info):
+            return self.first_name + ' ' + self.last_name
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporter = graphene.Field(ReporterNode)
+        article = graphene.Field(ArticleNode)
+        articles = PynamoConnectionField(ArticleNode, native_pagination=True)
+
+        def resolve_reporter(self, *args, **kwargs):
+            return Reporter.get(1)
+
+        def resolve_article(self, *args, **kwargs):
+            return Article.get(1)
+
+    schema = graphene.Schema(query=Query)
+
+    with patch.object(Article, 'scan', wraps=Article.scan) as scan:
+        result = schema.execute('{ articles(first: 5) { edges { node { id headline } } } }')
+    assert not result.errors
+    assert sorted(edge['node']['headline'] for edge in result.data['articles']['edges']) == ['Hi!', 'My Article']
+    assert scan.call_args[1]['attributes_to_get'] == ['headline', 'id']
+
+    with patch.object(Article, 'get', wraps=Article.get) as get:
+        result = schema.execute('''
+            query {
+              node(id: "QXJ0aWNsZU5vZGU6MQ==") {
+                ... on ArticleNode { headline reporter { id } }
+                ... on ReporterNode { firstName }
+              }
+            }
+        ''')
+    assert not result.errors
+    assert result.data['node']['headline'] == 'Hi!'
+    get.assert_called_once_with(1, attributes_to_get=['headline', 'id', 'reporter'])
+
+    with patch.object(Reporter, 'get', wraps=Reporter.get) as get:
+        result = schema.execute('{ articles(first: 5) { edges { node { reporter { firstName } } } } }')
+    assert not result.errors
+    assert result.data['articles']['edges'][0]['node']['reporter']['firstName'] == 'ABA'
+    get.assert_called_with(1, attributes_to_get=['first_name', 'id'])
+
+    with patch('graphene_pynamodb.relationships.batch_get', wraps=batch_get) as relationship_batch_get:
+        result = schema.execute('{ reporter { articles { edges { node { headline } } } } }')
+    assert not result.errors
+    assert relationship_batch_get.call_args[1]['attributes_to_get'] == ['headline', 'id']
+
+    # without a request context every selection of the relationship reads its own attributes
+    result = schema.execute('{ article { a: reporter { firstName } b: reporter { lastName } } }')
+    assert not result.errors
+    assert result.data['article'] == {'a': {'firstName': 'ABA'}, 'b': {'lastName': 'X'}}
+
+    # fields that do not map to an attribute need the whole item
+    with patch.object(Reporter, 'get', wraps=Reporter.get) as get:
+        result = schema.execute('{ node(id: "UmVwb3J0ZXJOb2RlOjE=") { ... on ReporterNode { fullName } } }')
+    assert not result.errors
+    assert result.data['node']['fullName'] == 'ABA X'
+    get.assert_called_once_with(1)
+
+
+def test_should_filter_on_the_server():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class CommentNode(PynamoObjectType):
+        class Meta:
+            model = Comment
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporters = PynamoConnectionField(ReporterNode, native_pagination=True, filters=True)
+        all_reporters = PynamoConnectionField(ReporterNode, filters=True)
+        comments = PynamoQueryConnectionField(CommentNode, filters=True)
+
+    schema = graphene.Schema(query=Query)
+
+    def first_names(data):
+        return sorted(edge['node']['firstName'] for edge in data['edges'])
+
+    result = schema.execute('''
+        query {
+          prefix: reporters(filter: {firstName: {beginsWith: "AB"}, lastName: {eq: "Y"}}) {
+            totalCount
+            edges { node { firstName } }
+          }
+          ids: reporters(filter: {id: {in: [1, 3]}}) {
+            edges { node { firstName } }
+          }
+          missing: allReporters(filter: {email: {exists: false}, firstName: {ne: "ABA"}}) {
+            edges { node { firstName } }
+          }
+          paged: reporters(first: 1, filter: {lastName: {between: ["X", "XX"]}}) {
+            edges { node { firstName } }
+          }
+          comments(articleId: "1", filter: {body: {contains: "ir"}}) {
+            totalCount
+            edges { node { body } }
+          }
+        }
+    ''')
+    assert not result.errors
+    assert first_names(result.data['prefix']) == ['ABO']
+    assert result.data['prefix']['totalCount'] == 1
+    assert first_names(result.data['ids']) == ['ABA']
+    assert first_names(result.data['missing']) == ['ABO']
+    assert first_names(result.data['paged']) == ['ABA']
+    assert [edge['node']['body'] for edge in result.data['comments']['edges']] == ['First', 'Third']
+    assert result.data['comments']['totalCount'] == 2
+
+    with patch.object(Reporter, 'scan', wraps=Reporter.scan) as scan:
+        schema.execute('{ reporters(filter: {firstName: {eq: "ABA"}}) { edges { node { id } } } }')
+    assert repr(scan.call_args[1]['filter_condition']) == repr(Reporter.first_name == 'ABA')
+
+
+def test_filter_should_only_expose_filterable_fields():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ('email',)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporters = PynamoConnectionField(ReporterNode, filters=True)
+        other_reporters = PynamoConnectionField(ReporterNode, filters=True)
+
+    schema = graphene.Schema(query=Query)
+    filter_type = schema.get_type('ReporterNodeFilter')
+    assert sorted(filter_type.fields.keys()) == ['firstName', 'id', 'lastName', 'pets']
+
+
+def test_filters_should_be_planned():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporters = PynamoConnectionField(ReporterNode, filters=True, explain=True)
+        keyed_reporters = PynamoConnectionField(ReporterNode, filters=True, allow_scan=False)
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute('''
+        query {
+          byName: reporters(explain: true, filter: {lastName: {eq: "X"}, firstName: {beginsWith: "A"}}) {
+            edges { node { id } }
+            queryPlan { operation indexName keyCondition filterCondition }
+          }
+          byIds: reporters(explain: true, filter: {id: {in: [1, 2]}}) {
+            queryPlan { operation estimatedReadUnits }
+          }
+          all: reporters(explain: true) {
+            totalCount
+            queryPlan { operation }
+          }
+        }
+    ''')
+    assert not result.errors
+    assert result.data['byName'] == {
+        'edges': [],
+        'queryPlan': {
+            'operation': 'index_query',
+            'indexName': 'reporter_name_index',
+            'keyCondition': repr((Reporter.last_name == 'X') & Reporter.first_name.startswith('A')),
+            'filterCondition': None,
+        }
+    }
+    assert result.data['byIds']['queryPlan'] == {'operation': 'batch_get', 'estimatedReadUnits': 1.0}
+    assert result.data['all']['queryPlan']['operation'] == 'scan'
+
+    # the plan is only filled when explain is set, and only connections of fields with explain have a plan field
+    result = schema.execute('{ reporters(first: 1) { queryPlan { operation } } }')
+    assert not result.errors
+    assert result.data['reporters']['queryPlan'] is None
+    assert 'query_plan' not in ReporterNode._meta.connection._meta.fields
+    assert Query._meta.fields['reporters'].type._meta.name == 'ReporterNodeExplainConnection'
+
+    # a key list with a filter is scanned, pages of index queries resume from the index keys
+    query = '''
+        query {
+          reporters(explain: true, first: 1, filter: {lastName: {between: ["X", "Y"]}, id: {in: [1, 2]}}) {
+            queryPlan { operation }
+          }
+          keyedReporters(first: 1, filter: {lastName: {eq: "X"}}) {
+            edges { node { firstName } cursor }
+          }
+        }
+    '''
+    result = schema.execute(query)
+    assert not result.errors
+    assert result.data['reporters']['queryPlan']['operation'] == 'scan'
+    keyed = result.data['keyedReporters']['edges']
+    assert [edge['node']['firstName'] for edge in keyed] == ['ABA']
+    assert json.loads(base64.b64decode(keyed[0]['cursor']).decode('utf-8')) == \
+        {'id': {'N': '1'}, 'last_name': {'S': 'X'}, 'first_name': {'S': 'ABA'}}
+
+    result = schema.execute('{ keyedReporters(filter: {firstName: {eq: "ABA"}}) { edges { node { id } } } }')
+    assert result.errors
+    assert 'Refusing to scan' in str(result.errors[0])
+
+
+def test_should_query_secondary_indexes():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class CommentNode(PynamoObjectType):
+        class Meta:
+            model = Comment
+            interfaces = (Node,)
+
+    class Query(index_connection_fields(ReporterNode, CommentNode), graphene.ObjectType):
+        node = Node.Field()
+
+    schema = graphene.Schema(query=Query)
+    assert sorted(schema.get_query_type().fields.keys()) == ['commentsByArticleId', 'node', 'reportersByLastName']
+    assert sorted(schema.get_query_type().fields['reportersByLastName'].args.keys()) == \
+        ['after', 'before', 'first', 'firstName', 'last', 'lastName']
+
+    query = '''
+        query ($after: String) {
+          reportersByLastName(lastName: "X", firstName: {beginsWith: "A"}) {
+            edges { node { firstName } }
+          }
+          commentsByArticleId(articleId: "1", first: 2, after: $after) {
+            totalCount
+            edges { node { body postedAt } }
+            pageInfo { hasNextPage endCursor }
+          }
+        }
+    '''
+    result = schema.execute(query)
+    assert not result.errors
+    assert [edge['node']['firstName'] for edge in result.data['reportersByLastName']['edges']] == ['ABA']
+    # the keys only index is read in body order and the items it points to are read in full
+    comments = result.data['commentsByArticleId']
+    assert comments['totalCount'] == 3
+    assert [edge['node'] for edge in comments['edges']] == [{'body': 'First', 'postedAt': '2017-01-01'},
+                                                            {'body': 'Second', 'postedAt': '2017-02-01'}]
+    assert comments['pageInfo']['hasNextPage']
+
+    result = schema.execute(query, variable_values={'after': comments['pageInfo']['endCursor']})
+    assert not result.errors
+    assert [edge['node']['body'] for edge in result.data['commentsByArticleId']['edges']] == ['Third']
+
+
+def test_should_batch_relationship_loads():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = graphene.List(ArticleNode)
+
+        def resolve_articles(self, info, **args):
+            return sorted(Article.scan(), key=lambda article: article.id)
+
+    schema = graphene.Schema(query=Query)
+    query = '{ articles { headline reporter { firstName } } }'
+    expected = [{'headline': 'Hi!', 'reporter': {'firstName': 'ABA'}},
+                {'headline': 'My Article', 'reporter': {'firstName': 'ABA'}}]
+
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get, \
+            patch.object(Reporter, 'get', wraps=Reporter.get) as get:
+        result = schema.execute(query, context_value={})
+    assert not result.errors
+    assert result.data['articles'] == expected
+    loader_batch_get.assert_called_once_with(Reporter, [1], attributes_to_get=None)
+    get.assert_not_called()
+
+    # without a request context every relationship is loaded on its own
+    with patch.object(Reporter, 'get', wraps=Reporter.get) as get:
+        result = schema.execute(query)
+    assert not result.errors
+    assert result.data['articles'] == expected
+    assert get.call_count == 2
+
+    # selecting the key only does not read the relationship
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute('{ articles { reporter { id } } }', context_value={})
+    assert not result.errors
+    loader_batch_get.assert_not_called()
+
+
+def test_should_batch_relationship_lists_across_parents():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    type_registry = Registry()
+
+    class ArticleType(PynamoObjectType):
+        class Meta:
+            model = Article
+            registry = type_registry
+
+    class ReporterType(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            registry = type_registry
+
+    def get_reporters():
+        reporters = [Reporter(id=10, first_name='A', last_name='B'), Reporter(id=11, first_name='C', last_name='D')]
+        reporters[0].articles = Reporter.articles.deserialize([3, 1])
+        reporters[1].articles = Reporter.articles.deserialize([1, 2])
+        return reporters
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporters = graphene.List(ReporterNode)
+        reporter_types = graphene.List(ReporterType)
+
+        def resolve_reporters(self, info, **args):
+            return get_reporters()
+
+        def resolve_reporter_types(self, info, **args):
+            return get_reporters()
+
+    schema = graphene.Schema(query=Query)
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute('''
+            query {
+              reporters { articles(first: 2) { edges { node { headline } } } }
+            }
+        ''', context_value={})
+    assert not result.errors
+    # one read for the pages of both parents, the missing article is skipped
+    loader_batch_get.assert_called_once_with(Article, [3, 1, 2], attributes_to_get=None)
+    assert [[edge['node']['headline'] for edge in reporter['articles']['edges']]
+            for reporter in result.data['reporters']] == [['My Article', 'Hi!'], ['Hi!']]
+
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute('{ reporterTypes { articles { headline } } }', context_value={})
+    assert not result.errors
+    loader_batch_get.assert_called_once_with(Article, [3, 1, 2], attributes_to_get=None)
+    assert result.data['reporterTypes'] == [{'articles': [{'headline': 'My Article'}, {'headline': 'Hi!'}]},
+                                            {'articles': [{'headline': 'Hi!'}]}]
+
+    # pages that only select keys and cursors are not read, their edges are the keys of the relationship
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get, \
+            patch('graphene_pynamodb.relationships.batch_get', wraps=batch_get) as relationship_batch_get:
+        result = schema.execute('''
+            query {
+              reporters { articles(first: 2) { edges { cursor node { id } } pageInfo { hasNextPage } } }
+            }
+        ''', context_value={})
+    assert not result.errors
+    loader_batch_get.assert_not_called()
+    relationship_batch_get.assert_not_called()
+    assert [[from_global_id(edge['node']['id'])[1] for edge in reporter['articles']['edges']]
+            for reporter in result.data['reporters']] == [['3', '1'], ['1', '2']]
+
+
+def test_should_prefetch_selected_relationships():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporters = PynamoConnectionField(ReporterNode, filters=True, prefetch_depth=2)
+        few_reporters = PynamoConnectionField(ReporterNode, filters=True, prefetch_depth=1,
+                                              prefetch_fan_out=1)
+
+    schema = graphene.Schema(query=Query)
+    query = '''
+        query {
+          %s(filter: {id: {eq: 1}}) {
+            edges { node { firstName articles(first: 5) { edges { node { headline reporter { firstName } } } } } }
+          }
+        }
+    '''
+    expected = [{'node': {'firstName': 'ABA', 'articles': {'edges': [
+        {'node': {'headline': 'Hi!', 'reporter': {'firstName': 'ABA'}}},
+        {'node': {'headline': 'My Article', 'reporter': {'firstName': 'ABA'}}}]}}}]
+
+    # the articles are read with the page of reporters, their reporter is the one already read
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute(query % 'reporters', context_value={})
+    assert not result.errors
+    assert result.data['reporters']['edges'] == expected
+    loader_batch_get.assert_called_once_with(Article, [1, 3], attributes_to_get=None)
+
+    # past the fan out, relationships are loaded when they are resolved
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute(query % 'fewReporters', context_value={})
+    assert not result.errors
+    assert result.data['fewReporters']['edges'] == expected
+    assert [call[0] for call in loader_batch_get.call_args_list] == [(Article, [1]), (Article, [3])]
+
+    # selections that only need keys are not prefetched
+    with patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute('{ reporters { edges { node { articles { edges { node { id } } } } } } }',
+                                context_value={})
+    assert not result.errors
+    loader_batch_get.assert_not_called()
+
+
+def test_should_batch_plural_node_lookups():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class EditorNode(PynamoObjectType):
+        class Meta:
+            model = Editor
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        nodes = PynamoNodesField()
+
+    schema = graphene.Schema(query=Query, types=[ReporterNode, ArticleNode, EditorNode])
+    ids = [to_global_id('ArticleNode', 3), to_global_id('ReporterNode', 1), to_global_id('ArticleNode', 2), 'invalid',
+           to_global_id('ArticleNode', 1), to_global_id('ReporterNode', 'x'), to_global_id('EditorNode', '1')]
+    query = '''
+        query($ids: [ID!]!) {
+          nodes(ids: $ids) {
+            id
+            ... on ArticleNode { headline }
+            ... on ReporterNode { firstName }
+            ... on EditorNode { name }
+          }
+        }
+    '''
+
+    with patch('graphene_pynamodb.types.batch_get', wraps=batch_get) as types_batch_get:
+        result = schema.execute(query, variable_values={'ids': ids}, context_value={})
+    assert not result.errors
+    assert result.data['nodes'] == [{'id': ids[0], 'headline': 'My Article'}, {'id': ids[1], 'firstName': 'ABA'},
+                                    None, None, {'id': ids[4], 'headline': 'Hi!'}, None,
+                                    {'id': ids[6], 'name': 'John'}]
+    assert [call[0] for call in types_batch_get.call_args_list] == [(Article, [3, 2, 1]), (Reporter, [1]),
+                                                                    (Editor, ['1'])]
+
+    # ids of types that are not nodes only null their own entry
+    ids = [to_global_id(type_name, 'x') for type_name in ('MapToJSONString', 'String', 'Query', 'Unknown')]
+    result = schema.execute(query, variable_values={'ids': ids + [to_global_id('EditorNode', '1')]})
+    assert not result.errors
+    assert result.data['nodes'] == [None, None, None, None, {'id': to_global_id('EditorNode', '1'), 'name': 'John'}]
+
+
+def test_should_resolve_composite_keys():
+    class Thread(Model):
+        class Meta:
+            table_name = 'test_graphene_pynamodb_threads'
+            host = DB_HOST
+            region = DB_REGION
+
+        id = NumberAttribute(hash_key=True)
+        pinned = OneToOne(Comment, null=True)
+        comments = OneToMany(Comment, null=True)
+
+    type_registry = Registry()
+
+    class CommentNode(PynamoObjectType):
+        class Meta:
+            model = Comment
+            interfaces = (Node,)
+            registry = type_registry
+
+    class ThreadNode(PynamoObjectType):
+        class Meta:
+            model = Thread
+            interfaces = (Node,)
+            registry = type_registry
+
+    def get_thread():
+        comments = [Comment(1, '2017-01-01'), Comment(1, '2017-02-01'), Comment(3, '2017-01-15')]
+        return Thread(id=1, pinned=comments[2], comments=comments)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        nodes = PynamoNodesField()
+        thread = graphene.Field(ThreadNode)
+
+        def resolve_thread(self, info, **args):
+            return Thread.from_raw_data(get_thread()._serialize()['attributes'])
+
+    schema = graphene.Schema(query=Query, types=[CommentNode])
+    comment_id = to_global_id('CommentNode', '[1,"2017-02-01"]')
+
+    result = schema.execute('query($id: ID!) { node(id: $id) { id ... on CommentNode { body } } }',
+                            variable_values={'id': comment_id})
+    assert not result.errors
+    assert result.data['node'] == {'id': comment_id, 'body': 'Second'}
+
+    ids = [comment_id, to_global_id('CommentNode', '[3,"2017-01-15"]'), to_global_id('CommentNode', '1'),
+           to_global_id('CommentNode', '[1,"2020-01-01"]')]
+    result = schema.execute('query($ids: [ID!]!) { nodes(ids: $ids) { ... on CommentNode { body } } }',
+                            variable_values={'ids': ids}, context_value={})
+    assert not result.errors
+    assert result.data['nodes'] == [{'body': 'Second'}, {'body': 'Other'}, None, None]
+
+    query = '''
+        query($after: String) {
+          thread {
+            pinned { body }
+            comments(first: 2, after: $after) { edges { cursor node { id postedAt body } } }
+          }
+        }
+    '''
+    result = schema.execute(query, context_value={})
+    assert not result.errors
+    assert result.data['thread']['pinned'] == {'body': 'Other'}
+    edges = result.data['thread']['comments']['edges']
+    assert [edge['node']['body'] for edge in edges] == ['First', 'Second']
+    assert edges[1]['node']['id'] == comment_id
+
+    result = schema.execute(query, variable_values={'after': edges[1]['cursor']}, context_value={})
+    assert not result.errors
+    assert [edge['node']['body'] for edge in result.data['thread']['comments']['edges']] == ['Other']
+
+
+def test_should_read_items_once_per_request():
+    class ReporterNode(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporters = PynamoConnectionField(ReporterNode, native_pagination=True)
+        articles = graphene.List(ArticleNode)
+
+        def resolve_articles(self, info, **args):
+            return sorted(Article.scan(), key=lambda article: article.id)
+
+    schema = graphene.Schema(query=Query)
+    query = '''
+        query {
+          first: node(id: "UmVwb3J0ZXJOb2RlOjE=") { ... on ReporterNode { firstName } }
+          again: node(id: "UmVwb3J0ZXJOb2RlOjE=") { ... on ReporterNode { lastName } }
+          articles { reporter { firstName } }
+        }
+    '''
+    with patch.object(Reporter, 'get', wraps=Reporter.get) as get, \
+            patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute(query, context_value={})
+    assert not result.errors
+    assert result.data['again'] == {'lastName': 'X'}
+    assert result.data['articles'] == [{'reporter': {'firstName': 'ABA'}}] * 2
+    get.assert_called_once_with(1)
+    loader_batch_get.assert_not_called()
+
+    # items read by connections are shared too
+    query = '''
+        query {
+          reporters(first: 5) { edges { node { firstName } } }
+          articles { reporter { firstName } }
+          node(id: "UmVwb3J0ZXJOb2RlOjI=") { ... on ReporterNode { firstName } }
+        }
+    '''
+    with patch.object(Reporter, 'get', wraps=Reporter.get) as get, \
+            patch('graphene_pynamodb.loaders.batch_get', wraps=batch_get) as loader_batch_get:
+        result = schema.execute(query, context_value={})
+    assert not result.errors
+    assert result.data['node'] == {'firstName': 'ABO'}
+    get.assert_not_called()
+    loader_batch_get.assert_not_called()
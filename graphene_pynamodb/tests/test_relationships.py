@@ -1,12 +1,20 @@
+from array import array
+from datetime import datetime, timezone
+
 import graphene
 import pytest
 from graphene import Node
 from mock import MagicMock
+from pynamodb.attributes import UnicodeAttribute, UTCDateTimeAttribute
+from pynamodb.models import Model
 from wrapt import ObjectProxy
 
-from .models import Reporter, Article
-from ..relationships import OneToOne, OneToMany, RelationshipResult
+from .models import DB_HOST, DB_REGION, Article, Comment, Reporter
+from ..fields import seek_cursor
+from ..relationships import OneToOne, OneToMany, Relationship, RelationshipReference, RelationshipResult, \
+    RelationshipResultList
 from ..types import PynamoObjectType
+from ..utils import from_key_string, get_model_metadata, to_key_string
 
 
 def setup_fixtures():
@@ -112,6 +120,44 @@ def test_relationships_should_raiseerror():
         OneToMany(object)
 
 
+def test_relationships_should_resolve_model_names():
+    assert Relationship.get_model('Article') is Article
+    assert Relationship.get_model('graphene_pynamodb.tests.models.Article') is Article
+    assert Relationship.get_model('UnknownModel') is None
+
+    # models defined after the first lookup are found too
+    class LateModel(Model):
+        pass
+
+    assert OneToOne('LateModel').model is LateModel
+
+    # names shared by models of different modules only resolve as module.name
+    first = type('Duplicate', (Model,), {'__module__': 'first'})
+    second = type('Duplicate', (Model,), {'__module__': 'second'})
+    with pytest.raises(ValueError):
+        Relationship.get_model('Duplicate')
+    assert Relationship.get_model('first.Duplicate') is first
+    assert Relationship.get_model('second.Duplicate') is second
+
+    # and a name that was already resolved becomes ambiguous once a model of another module taking it is indexed
+    third = type('Triplicate', (Model,), {'__module__': 'third'})
+    assert OneToOne('Triplicate').model is third
+    fourth = type('Triplicate', (Model,), {'__module__': 'fourth'})
+    Relationship.index_model(fourth)
+    with pytest.raises(ValueError):
+        Relationship.get_model('Triplicate')
+    assert Relationship.get_model('third.Triplicate') is third
+
+    # as it is when a lookup of a name that is not indexed yet walks the models again
+    fifth = type('Quadruplicate', (Model,), {'__module__': 'fifth'})
+    assert Relationship.get_model('Quadruplicate') is fifth
+    type('Quadruplicate', (Model,), {'__module__': 'sixth'})
+    assert Relationship.get_model('Quadruplicate') is fifth
+    assert Relationship.get_model('sixth.Quadruplicate').__module__ == 'sixth'
+    with pytest.raises(ValueError):
+        Relationship.get_model('Quadruplicate')
+
+
 def test_onetoone_should_serialize_well():
     fixtures = setup_fixtures()
     relationship = OneToOne(Article)
@@ -146,6 +192,97 @@ def test_onetomany_should_deserialize_well():
     assert articles[1].headline == "My Article"
 
 
+def test_onetomany_should_decode_keys_lazily():
+    relationship = OneToMany(Article)
+    raw = [{'N': str(key)} for key in range(10)]
+    articles = relationship.deserialize(raw)
+    assert articles._store.raw is raw
+
+    assert len(articles) == 10
+    assert articles._store.raw is None
+    assert isinstance(articles._store.keys, array)
+    assert articles == list(range(10))
+    assert relationship.serialize(articles) == raw
+
+    # slices are views on the keys of the list
+    page = articles[2:8][1:]
+    assert page._store is articles._store
+    assert page.get_keys() == [3, 4, 5, 6, 7]
+    assert [article.id for article in page[-2:]] == [6, 7]
+    assert page.get_key(-1) == 7 and page.index_of_key('4') == 1
+    assert not articles[20:] and articles[::3] == [0, 3, 6, 9]
+    with pytest.raises(IndexError):
+        page[5]
+
+    # list methods see the keys, items and references are found by their key
+    assert 3 in page and Article(3) in page and page[0] in articles and 2 not in page and 'a' not in articles
+    assert [article.id for article in reversed(page)] == [7, 6, 5, 4, 3]
+    assert page.index(Article(5)) == 2 and articles.count(4) == 1
+    assert page + [8] == [3, 4, 5, 6, 7, 8] and [2] + page[:1] == [2, 3] and page[:1] * 2 == [3, 3]
+    assert page.copy() == page and page.copy()._store is not page._store
+
+    assert relationship.deserialize([{'S': 'a'}, {'S': 'b'}]).get_keys() == ['a', 'b']
+    assert relationship.deserialize([{'N': str(2 ** 70)}]).get_keys() == [2 ** 70]
+
+
+def test_relationships_should_handle_composite_keys():
+    comments = [Comment(1, '2017-01-01'), Comment(3, '2017-01-15')]
+    one = OneToOne(Comment)
+    assert one.serialize(comments[1]) == '[3,"2017-01-15"]'
+    comment = one.deserialize('[3,"2017-01-15"]')
+    assert (comment.article_id, comment.posted_at) == (3, '2017-01-15')
+    assert comment == comments[1] and comment != comments[0]
+    assert comment.body == 'Other'
+
+    many = OneToMany(Comment)
+    raw = [{'L': [{'N': '1'}, {'S': '2017-01-01'}]}, {'L': [{'N': '3'}, {'S': '2017-01-15'}]}]
+    assert many.serialize(comments) == raw
+    related = many.deserialize(raw)
+    assert related.get_keys() == [(1, '2017-01-01'), (3, '2017-01-15')]
+    assert many.serialize(related) == raw
+    assert [(reference.article_id, reference.posted_at) for reference in related] == \
+        [(1, '2017-01-01'), (3, '2017-01-15')]
+    assert related[0] == comments[0]
+    assert related.index_of_key('[3,"2017-01-15"]') == 1
+    assert [comment.body for comment in related.resolve()] == ['First', 'Other']
+
+
+def test_relationships_should_serialize_composite_keys_with_their_attributes():
+    class Event(Model):
+        class Meta:
+            table_name = 'test_graphene_pynamodb_events'
+            host = DB_HOST
+            region = DB_REGION
+
+        stream = UnicodeAttribute(hash_key=True)
+        happened_at = UTCDateTimeAttribute(range_key=True)
+        name = UnicodeAttribute()
+
+    if not Event.exists():
+        Event.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    dates = [datetime(2017, 1, 1, tzinfo=timezone.utc), datetime(2017, 1, 2, 12, 30, tzinfo=timezone.utc)]
+    events = [Event('a', date, name='Event %d' % i) for i, date in enumerate(dates)]
+    for event in events:
+        event.save()
+
+    metadata = get_model_metadata(Event)
+    key_string = to_key_string(metadata, ('a', dates[1]))
+    assert key_string == '["a","2017-01-02T12:30:00.000000+0000"]'
+    assert from_key_string(metadata, key_string) == ('a', dates[1])
+
+    one = OneToOne(Event)
+    assert one.serialize(events[1]) == key_string
+    assert one.deserialize(key_string).name == 'Event 1'
+
+    many = OneToMany(Event)
+    raw = many.serialize(events)
+    assert raw[0] == {'L': [{'S': 'a'}, {'S': '2017-01-01T00:00:00.000000+0000'}]}
+    related = many.deserialize(raw)
+    assert related.get_keys() == [('a', date) for date in dates]
+    assert related.index_of_key(key_string) == 1
+    assert [event.name for event in related.resolve()] == ['Event 0', 'Event 1']
+
+
 def test_result_should_be_lazy():
     MockArticle = ObjectProxy(Article)
     MockArticle.get = MagicMock(return_value=Article.get(1))
@@ -161,6 +298,47 @@ def test_result_should_be_lazy():
     MockArticle.get.assert_called_once_with(1)
 
 
+def test_list_items_should_be_lazy_references():
+    fixtures = setup_fixtures()
+    MockArticle = ObjectProxy(Article)
+    MockArticle.get = MagicMock(return_value=Article.get(1))
+    articles = RelationshipResultList('id', MockArticle, [1, 3])
+
+    references = list(articles)
+    assert all(isinstance(reference, RelationshipReference) for reference in references)
+    assert [reference.id for reference in references] == [1, 3]
+    assert references[0] == articles[0] and references[0] != references[1]
+    assert len(set(articles)) == 2
+    assert fixtures['ArticleType'].is_type_of(references[0], None)
+    assert not fixtures['ReporterType'].is_type_of(references[0], None)
+    MockArticle.get.assert_not_called()
+
+    assert references[0].headline == "Hi!"
+    assert references[0].reporter.id == 1
+    MockArticle.get.assert_called_once_with(1)
+
+
+def test_references_should_not_hide_attributes_of_the_item():
+    class Setting(Model):
+        class Meta:
+            table_name = 'test_graphene_pynamodb_settings'
+            host = DB_HOST
+            region = DB_REGION
+
+        name = UnicodeAttribute(hash_key=True)
+        key = UnicodeAttribute()
+        model = UnicodeAttribute()
+        item = UnicodeAttribute()
+
+    if not Setting.exists():
+        Setting.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    Setting('paint', key='color', model='car', item='red').save()
+
+    (reference,) = OneToMany(Setting).deserialize([{'S': 'paint'}])
+    assert reference.name == 'paint'
+    assert (reference.key, reference.model, reference.item) == ('color', 'car', 'red')
+
+
 def test_relationships_should_compare_well():
     article1 = Article(1, headline="test")
     article2 = Article(2, headline="test")
@@ -212,3 +390,14 @@ def test_onetomany_should_handle_not_being_lazy():
     # make sure our call count is still 1
     MockArticle.batch_get.assert_called_once()
     MockArticle.get.assert_not_called()
+
+
+def test_cursor_should_seek_with_position_hint():
+    articles = RelationshipResultList('id', Article, [5, 7, 9])
+    assert seek_cursor(articles, get_model_metadata(Article), '1:7') == 1
+    # a stale position falls back to the key
+    assert seek_cursor(articles, get_model_metadata(Article), '0:9') == 2
+    # legacy cursors only carry the key
+    assert seek_cursor(articles, get_model_metadata(Article), '9') == 2
+    assert seek_cursor(articles, get_model_metadata(Article), '3') is None
+    assert seek_cursor([Article(5), Article(7)], get_model_metadata(Article), '5:7') == 1
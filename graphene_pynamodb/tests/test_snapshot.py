@@ -0,0 +1,97 @@
+import json
+
+import graphene
+from graphene import relay
+from mock import patch
+
+from .models import Article, Reporter
+from ..registry import Registry
+from ..snapshot import INTROSPECTIONS, SchemaSnapshot, get_introspection, main
+from ..types import PynamoObjectType
+
+snapshot_registry = Registry()
+
+
+class ReporterNode(PynamoObjectType):
+    class Meta:
+        model = Reporter
+        interfaces = (relay.Node,)
+        registry = snapshot_registry
+
+
+class ArticleNode(PynamoObjectType):
+    class Meta:
+        model = Article
+        interfaces = (relay.Node,)
+        registry = snapshot_registry
+
+
+def build_schema(*types):
+    class Query(graphene.ObjectType):
+        node = relay.Node.Field()
+        reporter = graphene.Field(types[0])
+
+    return graphene.Schema(query=Query, types=types)
+
+
+def test_snapshot_should_serve_the_introspection_of_the_same_schema(tmpdir):
+    path = str(tmpdir.join('schema.json'))
+    schema = build_schema(ReporterNode, ArticleNode)
+    assert main(['graphene_pynamodb.tests.test_snapshot:snapshot_schema', path]) == 0
+    with open(path) as snapshot_file:
+        assert json.load(snapshot_file)['introspection'] == schema.introspect()
+
+    # an identical schema built by another process
+    schema = build_schema(ReporterNode, ArticleNode)
+    snapshot = SchemaSnapshot(path)
+    assert snapshot.data is None
+    with patch.object(schema, 'introspect') as introspect:
+        introspection = get_introspection(schema, snapshot)
+        assert get_introspection(schema, snapshot) is introspection
+    introspect.assert_not_called()
+    assert snapshot.data is not None
+    assert introspection['__schema']['queryType'] == {'name': 'Query'}
+
+
+def test_snapshot_should_be_ignored_when_the_schema_changed(tmpdir):
+    path = str(tmpdir.join('schema.json'))
+    SchemaSnapshot(path).save(build_schema(ReporterNode, ArticleNode))
+
+    schema = build_schema(ArticleNode, ReporterNode)
+    introspection = get_introspection(schema, SchemaSnapshot(path))
+    assert introspection == schema.introspect()
+    assert INTROSPECTIONS[schema] is introspection
+
+    # descriptions are not in the printed schema
+    schema = build_schema(ReporterNode, ArticleNode)
+    schema.get_type('Query').fields['reporter'].description = 'The reporter'
+    assert get_introspection(schema, SchemaSnapshot(path)) == schema.introspect()
+
+
+def test_snapshot_of_the_same_build_should_skip_the_fingerprint(tmpdir):
+    path = str(tmpdir.join('schema.json'))
+    assert main(['graphene_pynamodb.tests.test_snapshot:snapshot_schema', path, 'build-1']) == 0
+
+    schema = build_schema(ReporterNode, ArticleNode)
+    with patch('graphene_pynamodb.snapshot.get_fingerprint') as get_fingerprint:
+        introspection = SchemaSnapshot(path, build_id='build-1').get_introspection(schema)
+    get_fingerprint.assert_not_called()
+    assert introspection == schema.introspect()
+
+    # other builds, and callers without a build id, still compare the fingerprints
+    for snapshot in (SchemaSnapshot(path, build_id='build-2'), SchemaSnapshot(path)):
+        with patch('graphene_pynamodb.snapshot.get_fingerprint', return_value='changed') as get_fingerprint:
+            assert snapshot.get_introspection(schema) is None
+        get_fingerprint.assert_called_once_with(schema)
+
+
+def test_missing_snapshot_should_introspect_once(tmpdir):
+    schema = build_schema(ReporterNode)
+    snapshot = SchemaSnapshot(str(tmpdir.join('missing.json')))
+    with patch.object(schema, 'introspect', wraps=schema.introspect) as introspect:
+        assert get_introspection(schema, snapshot) == get_introspection(schema, snapshot)
+    introspect.assert_called_once_with()
+    assert snapshot.load() == {}
+
+
+snapshot_schema = build_schema(ReporterNode, ArticleNode)
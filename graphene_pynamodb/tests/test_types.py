@@ -71,3 +71,28 @@ def test_object_type():
     assert issubclass(Human, ObjectType)
     assert sorted(list(Human._meta.fields.keys())) == ['headline', 'id', 'pub_date', 'reporter']
     assert is_node(Human)
+
+
+def test_connection_should_be_created_when_used():
+    class ArticleNode(PynamoObjectType):
+        class Meta:
+            model = Article
+            registry = registry
+            interfaces = (Node,)
+
+    assert ArticleNode._meta._connection is None
+    connection = ArticleNode._meta.connection
+    assert connection._meta.name == 'ArticleNodeConnection'
+    assert ArticleNode._meta.connection is connection
+    assert ArticleNode.get_connection() is connection
+    assert Character._meta.connection is None
+
+
+def test_converted_fields_should_be_shared_by_the_types_of_a_model():
+    class OtherCharacter(PynamoObjectType):
+        class Meta:
+            model = Reporter
+            registry = registry
+
+    assert OtherCharacter._meta.fields['first_name'].type == Character._meta.fields['first_name'].type
+    assert OtherCharacter._meta.fields['articles'] is Character._meta.fields['articles']
@@ -2,7 +2,9 @@ import pytest
 from pynamodb.attributes import UnicodeAttribute, NumberAttribute
 from pynamodb.models import Model
 
-from ..utils import get_key_name
+from .models import Comment, Editor, Reporter
+from ..utils import coerce_number, from_key_string, get_key_name, get_item_key, get_model_metadata, to_cursor, \
+    from_cursor
 
 
 def test_getkeyname_should_raiseerror():
@@ -30,3 +32,40 @@ def test_getkeyname_should_workonnumbers():
         myid = NumberAttribute(hash_key=True)
 
     assert get_key_name(MyModel) == 'myid'
+
+
+def test_model_metadata_should_be_compiled_once():
+    metadata = get_model_metadata(Comment)
+    assert get_model_metadata(Comment) is metadata
+    assert [name for name, _ in metadata.key_attributes] == ['article_id', 'posted_at']
+    assert metadata.key_attribute_names == ('article_id', 'posted_at')
+    assert (metadata.hash_key_name, metadata.range_key_name, metadata.hash_key_type) == ('article_id', 'posted_at', 'N')
+    assert metadata.coerce_hash_key('3') == 3 and metadata.coerce_hash_key('1.5') == 1.5
+    assert metadata.coerce_range_key('2017-01-01') == '2017-01-01'
+    assert get_item_key(Comment(3, '2017-01-15')) == (3, '2017-01-15')
+    assert metadata.key_types == ('N', 'S')
+    assert [serialize(value) for serialize, value in zip(metadata.key_serializers, (3, 'a'))] == ['3', 'a']
+    assert [deserialize(value) for deserialize, value in zip(metadata.key_deserializers, ('3', 'a'))] == [3, 'a']
+
+    assert get_model_metadata(Reporter).range_key_attribute is None
+    assert get_model_metadata(Editor).hash_key_type == 'S'
+    with pytest.raises(TypeError):
+        get_model_metadata(object)
+
+
+def test_cursor_should_roundtrip():
+    key = {'id': {'N': '1'}}
+    assert from_cursor(to_cursor(key)) == key
+
+
+def test_cursor_should_raiseerror_on_invalid():
+    with pytest.raises(ValueError):
+        from_cursor('not a cursor')
+
+
+def test_numbers_should_be_coerced_exactly():
+    assert from_key_string(get_model_metadata(Reporter), '9007199254740993') == 9007199254740993
+    assert coerce_number('12345678901234567891') == 12345678901234567891
+    assert coerce_number('-7') == -7 and coerce_number('2.0') == 2 and coerce_number('0.25') == 0.25
+    with pytest.raises(ValueError):
+        coerce_number('x')
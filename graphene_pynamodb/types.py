@@ -1,31 +1,34 @@
 from collections import OrderedDict
+from functools import partial
 from inspect import isclass
+from threading import RLock
 
 from graphene import Field, Connection, Node
 from graphene.relay import is_node
 from graphene.types.objecttype import ObjectType, ObjectTypeOptions
 from graphene.types.utils import yank_fields_from_attrs
-from pynamodb.attributes import Attribute, NumberAttribute
 from pynamodb.models import Model
 
+from .batch import batch_get
+from .cache import cached_get, item_cache
 from .converter import convert_pynamo_attribute
+from .loaders import get_identity_map, remember
 from .registry import Registry, get_global_registry
-from .relationships import RelationshipResult
-from .utils import get_key_name, connection_for_type
+from .relationships import Relationship, RelationshipReference, RelationshipResult
+from .utils import from_key_string, get_key_value, get_model_metadata, connection_for_type, get_projection, \
+    to_key_string
+
+
+# (model, attribute name, registry) -> the converted field, shared by the types of a model
+CONVERTED_FIELDS = {}
+CONNECTION_LOCK = RLock()
 
 
 def get_model_fields(model, excluding=None):
+    # the attributes PynamoDB collected when the model class was created
     if excluding is None:
         excluding = []
-    attributes = dict()
-    for attr_name in vars(model):
-        if attr_name in excluding:
-            continue
-        attr = getattr(model, attr_name)
-        if isinstance(attr, Attribute):
-            attributes[attr_name] = attr
-
-    return OrderedDict(sorted(attributes.items(), key=lambda t: t[0]))
+    return OrderedDict(sorted((name, attr) for name, attr in model.get_attributes().items() if name not in excluding))
 
 
 def construct_fields(model, registry, only_fields, exclude_fields):
@@ -41,24 +44,46 @@ def construct_fields(model, registry, only_fields, exclude_fields):
             # We skip this field if we specify only_fields and is not
             # in there. Or when we excldue this field in exclude_fields
             continue
-        converted_column = convert_pynamo_attribute(attribute, attribute, registry)
-        fields[name] = converted_column
+        key = (model, name, registry)
+        if key not in CONVERTED_FIELDS:
+            CONVERTED_FIELDS[key] = convert_pynamo_attribute(attribute, attribute, registry)
+        fields[name] = CONVERTED_FIELDS[key]
 
     return fields
 
 
 class PynamoObjectTypeOptions(ObjectTypeOptions):
     model = None  # type: Model
+    model_metadata = None  # type: ModelMetadata
     registry = None  # type: Registry
-    connection = None  # type: Type[Connection]
+    # builds the connection created for the type the first time it is needed
+    connection_factory = None  # type: Callable
+    _connection = None  # type: Type[Connection]
     id = None  # type: str
+    projection_pushdown = False  # type: bool
+    cache_ttl = None  # type: float
+    cache_serve_stale = False  # type: bool
+
+    @property
+    def connection(self):
+        if self._connection is None and self.connection_factory is not None:
+            with CONNECTION_LOCK:
+                if self._connection is None:
+                    # options are frozen once the type is created
+                    self.__dict__['_connection'] = self.connection_factory()
+        return self._connection
+
+    @connection.setter
+    def connection(self, connection):
+        self._connection = connection
 
 
 class PynamoObjectType(ObjectType):
     @classmethod
     def __init_subclass_with_meta__(cls, model=None, registry=None, skip_registry=False,
                                     only_fields=(), exclude_fields=(), connection=None,
-                                    use_connection=None, interfaces=(), id=None, **options):
+                                    use_connection=None, interfaces=(), id=None, projection_pushdown=False,
+                                    cache_ttl=None, cache_serve_stale=False, **options):
         assert model and isclass(model) and issubclass(model, Model), (
             'You need to pass a valid PynamoDB Model in '
             '{}.Meta, received "{}".'
@@ -66,6 +91,8 @@ class PynamoObjectType(ObjectType):
 
         if not registry:
             registry = get_global_registry()
+        # relationships can reference the models of types by name before walking the Model subclasses
+        Relationship.index_model(model)
 
         assert isinstance(registry, Registry), (
             'The attribute registry in {} needs to be an instance of '
@@ -80,9 +107,10 @@ class PynamoObjectType(ObjectType):
         if use_connection is None and interfaces:
             use_connection = any((issubclass(interface, Node) for interface in interfaces))
 
+        connection_factory = None
         if use_connection and not connection:
-            # We create the connection automatically
-            connection = Connection.create_type('{}Connection'.format(cls.__name__), node=cls)
+            # We create the connection automatically, when a field first uses it
+            connection_factory = partial(connection_for_type, cls, '{}Connection'.format(cls.__name__))
 
         if connection is not None:
             assert issubclass(connection, Connection), (
@@ -91,10 +119,20 @@ class PynamoObjectType(ObjectType):
 
         _meta = PynamoObjectTypeOptions(cls)
         _meta.model = model
+        # the key names, types and coercions of the model, compiled once for the resolvers
+        _meta.model_metadata = get_model_metadata(model)
         _meta.registry = registry
         _meta.fields = pynamo_fields
         _meta.connection = connection
+        _meta.connection_factory = connection_factory
         _meta.id = id or 'id'
+        # only read the attributes selected in the query, for types whose fields all map to model attributes
+        _meta.projection_pushdown = projection_pushdown
+        # keep the items read by the library in the process wide item cache for cache_ttl seconds
+        _meta.cache_ttl = cache_ttl
+        _meta.cache_serve_stale = cache_serve_stale
+        if cache_ttl:
+            item_cache.configure(model, cache_ttl, serve_stale=cache_serve_stale)
 
         super(PynamoObjectType, cls).__init_subclass_with_meta__(_meta=_meta, interfaces=interfaces, **options)
 
@@ -105,20 +143,54 @@ class PynamoObjectType(ObjectType):
     def is_type_of(cls, root, info):
         if isinstance(root, RelationshipResult) and root.__wrapped__ == cls._meta.model:
             return True
+        if isinstance(root, RelationshipReference):
+            return root._rr_model == cls._meta.model
         return isinstance(root, cls._meta.model)
 
     @classmethod
     def get_node(cls, info, id):
-        if isinstance(getattr(cls._meta.model, get_key_name(cls._meta.model)), NumberAttribute):
-            return cls._meta.model.get(int(id))
-        else:
-            return cls._meta.model.get(id)
+        model = cls._meta.model
+        projection = get_projection(info, cls)
+        # ids of models with composite keys hold both keys
+        id = from_key_string(cls._meta.model_metadata, id)
+
+        # items already read in this request are not read again
+        identity_map = get_identity_map(info)
+        item = identity_map.get(model, id, projection) if identity_map is not None else None
+        if item is None:
+            item = cached_get(model, id, projection)
+            remember(info, [item], projection)
+        return item
+
+    @classmethod
+    def get_nodes(cls, info, ids):
+        # the items of ids in their order, None for the ids of items that do not exist
+        model = cls._meta.model
+        projection = get_projection(info, cls)
+        metadata = cls._meta.model_metadata
+        keys = []
+        for id in ids:
+            try:
+                keys.append(from_key_string(metadata, id))
+            except (ValueError, TypeError):
+                keys.append(None)
+
+        identity_map = get_identity_map(info)
+        found = {}
+        if identity_map is not None:
+            found = dict((key, identity_map.get(model, key, projection)) for key in keys if key is not None)
+        unread = [key for key in keys if key is not None and found.get(key) is None]
+        items = batch_get(model, unread, attributes_to_get=projection) if unread else []
+        remember(info, items, projection)
+        found.update((get_key_value(item, metadata.key_name), item) for item in items)
+        return [found.get(key) if key is not None else None for key in keys]
 
     def resolve_id(self, info):
         graphene_type = info.parent_type.graphene_type
         if is_node(graphene_type):
-            return getattr(self, get_key_name(graphene_type._meta.model))
+            metadata = graphene_type._meta.model_metadata
+            return to_key_string(metadata, get_key_value(self, metadata.key_name))
 
     @classmethod
     def get_connection(cls):
-        return connection_for_type(cls)
+        return cls._meta.connection or connection_for_type(cls)
@@ -1,33 +1,318 @@
+import json
+from collections import OrderedDict, namedtuple
+from functools import partial
+from threading import Lock
+
 import graphene
-from pynamodb.attributes import Attribute
+from graphene.utils.str_converters import to_camel_case
+from botocore.exceptions import BotoCoreError, ClientError
+from graphql.language import ast
+from graphql_relay.utils import base64, unbase64
+from pynamodb.attributes import NumberAttribute, UnicodeAttribute
+from pynamodb.constants import ATTR_TYPE_MAP, CAMEL_COUNT, COUNT, EXCLUSIVE_START_KEY, EXPRESSION_ATTRIBUTE_NAMES, \
+    EXPRESSION_ATTRIBUTE_VALUES, FILTER_EXPRESSION, LAST_EVALUATED_KEY, SCAN, SELECT, TABLE_NAME
+from pynamodb.exceptions import ScanError
 from pynamodb.models import Model
+from six import string_types
 
-MODEL_KEY_REGISTRY = {}
+# the key facts of a model that resolvers need on every item, compiled once per model class
+ModelMetadata = namedtuple('ModelMetadata', [
+    'model',
+    'attributes',
+    # (python name, attribute) of the hash key and of the range key if there is one
+    'key_attributes',
+    'key_attribute_names',
+    'hash_key_name',
+    'hash_key_attribute',
+    'range_key_name',
+    'range_key_attribute',
+    # what relationships and resolvers read the key of an item with: the python name of the hash key, or the names
+    # of the hash and range keys for composite keys, which are (hash key, range key) tuples
+    'key_name',
+    # the DynamoDB type of the hash key (N, S or B) and the function that turns ids and cursors into its values
+    'hash_key_type',
+    'coerce_hash_key',
+    'coerce_range_key',
+    # the DynamoDB types of the key attributes with the functions that serialize and deserialize their values, in
+    # key order
+    'key_types',
+    'key_serializers',
+    'key_deserializers',
+])
+# key values written as they are in key strings
+KEY_STRING_TYPES = string_types + (int, float)
+MODEL_METADATA = {}
+CONNECTIONS = {}
+MODEL_METADATA_LOCK = Lock()
 
 
-def get_key_name(model):
+def get_model_metadata(model):
+    metadata = MODEL_METADATA.get(model)
+    if metadata is not None:
+        return metadata
     if not issubclass(model, Model):
+        raise TypeError("Invalid type passed to get_model_metadata: %s" % model.__class__)
+
+    with MODEL_METADATA_LOCK:
+        if model not in MODEL_METADATA:
+            MODEL_METADATA[model] = compile_model_metadata(model)
+        return MODEL_METADATA[model]
+
+
+def compile_model_metadata(model):
+    attributes = model.get_attributes()
+    hash_keys = [(name, attr) for name, attr in attributes.items() if attr.is_hash_key]
+    range_keys = [(name, attr) for name, attr in attributes.items() if attr.is_range_key]
+    key_attributes = tuple(hash_keys + range_keys)
+    (hash_key_name, hash_key_attribute) = hash_keys[0] if hash_keys else (None, None)
+    (range_key_name, range_key_attribute) = range_keys[0] if range_keys else (None, None)
+    return ModelMetadata(
+        model=model,
+        attributes=attributes,
+        key_attributes=key_attributes,
+        key_attribute_names=tuple(attr.attr_name for _, attr in key_attributes),
+        hash_key_name=hash_key_name,
+        hash_key_attribute=hash_key_attribute,
+        range_key_name=range_key_name,
+        range_key_attribute=range_key_attribute,
+        key_name=(hash_key_name, range_key_name) if range_key_name else hash_key_name,
+        hash_key_type=ATTR_TYPE_MAP[hash_key_attribute.attr_type] if hash_key_attribute else None,
+        coerce_hash_key=get_key_coercion(hash_key_attribute),
+        coerce_range_key=get_key_coercion(range_key_attribute),
+        key_types=tuple(ATTR_TYPE_MAP[attr.attr_type] for _, attr in key_attributes),
+        key_serializers=tuple(attr.serialize for _, attr in key_attributes),
+        key_deserializers=tuple(attr.deserialize for _, attr in key_attributes),
+    )
+
+
+def get_key_name(model):
+    try:
+        metadata = get_model_metadata(model)
+    except TypeError:
         raise TypeError("Invalid type passed to get_key_name: %s" % model.__class__)
+    return metadata.hash_key_attribute.attr_name if metadata.hash_key_attribute else None
+
+
+def get_key_attributes(model):
+    return list(get_model_metadata(model).key_attributes)
+
+
+def get_key_attribute_names(model):
+    return list(get_model_metadata(model).key_attribute_names)
+
+
+def get_item_key(item):
+    # the (hash key[, range key]) values of an item
+    return tuple(getattr(item, name) for name, _ in get_model_metadata(item.__class__).key_attributes)
+
+
+def get_key_value(item, key_name):
+    if isinstance(key_name, tuple):
+        return tuple(getattr(item, name) for name in key_name)
+    return getattr(item, key_name)
+
+
+def to_key_string(metadata, key):
+    # the key in ids and relationship cursors: composite keys are written as compact JSON arrays. Key values other than
+    # strings and numbers (dates...) are written in the serialized form of their attribute.
+    if isinstance(key, tuple):
+        return json.dumps([value if isinstance(value, KEY_STRING_TYPES) else serialize(value)
+                           for serialize, value in zip(metadata.key_serializers, key)], separators=(',', ':'))
+    return str(key) if isinstance(key, KEY_STRING_TYPES) else metadata.key_serializers[0](key)
+
+
+def from_key_string(metadata, value):
+    if metadata.range_key_attribute is None:
+        return metadata.coerce_hash_key(value)
+    if not isinstance(value, tuple):
+        value = json.loads(value)
+    (hash_key, range_key) = value
+    return metadata.coerce_hash_key(hash_key), metadata.coerce_range_key(range_key)
+
+
+def get_key_coercion(attribute):
+    if isinstance(attribute, NumberAttribute):
+        return coerce_number
+    if attribute is None or isinstance(attribute, UnicodeAttribute):
+        return coerce_value
+    # the other keys are written in their serialized form
+    return partial(coerce_serialized, attribute)
+
+
+def coerce_key(attribute, value):
+    # keys come in from GraphQL arguments and ids as strings
+    return get_key_coercion(attribute)(value)
+
+
+def coerce_number(value):
+    if isinstance(value, (int, float)):
+        return value
+    # integers are parsed exactly, going through a float would round those above 2**53
+    try:
+        return int(value)
+    except ValueError:
+        number = float(value)
+        return int(number) if number.is_integer() else number
+
+
+def coerce_value(value):
+    return value
+
+
+def coerce_serialized(attribute, value):
+    return attribute.deserialize(value) if isinstance(value, string_types) else value
+
+
+def serialize_key(item, key_attributes):
+    # build a DynamoDB key (same format as LastEvaluatedKey) from a model instance
+    return dict((attr.attr_name, {ATTR_TYPE_MAP[attr.attr_type]: attr.serialize(getattr(item, name))})
+                for name, attr in key_attributes)
+
+
+def to_cursor(key):
+    return base64(json.dumps(key, sort_keys=True, separators=(',', ':')))
+
+
+def from_cursor(cursor):
+    try:
+        key = json.loads(unbase64(cursor))
+    except ValueError:
+        key = None
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor: %s" % cursor)
+    return key
+
+
+def get_selections(info, field_asts=None, type_names=None):
+    # map every field name selected under field_asts (the field being resolved by default) to its field nodes,
+    # fragments on other types than type_names are skipped
+    selections = OrderedDict()
+    for field_ast in (info.field_asts if field_asts is None else field_asts):
+        if field_ast.selection_set:
+            collect_selections(info, field_ast.selection_set.selections, selections, type_names)
+    return selections
+
+
+def collect_selections(info, selections, collected, type_names=None):
+    for selection in selections:
+        if isinstance(selection, ast.Field):
+            collected.setdefault(selection.name.value, []).append(selection)
+            continue
+
+        if isinstance(selection, ast.FragmentSpread):
+            selection = info.fragments[selection.name.value]
+        type_condition = getattr(selection, 'type_condition', None)
+        if type_names and type_condition and type_condition.name.value not in type_names:
+            continue
+        collect_selections(info, selection.selection_set.selections, collected, type_names)
+
+
+def get_type_names(graphene_type):
+    return set([graphene_type._meta.name] + [interface._meta.name for interface in graphene_type._meta.interfaces])
+
+
+def get_node_field_asts(info, field_asts=None):
+    # the node fields of a connection: { edges { node { ... } } }
+    edges = get_selections(info, field_asts).get('edges', [])
+    return get_selections(info, edges).get('node', [])
+
+
+def get_projection(info, graphene_type, field_asts=None):
+    # DynamoDB attribute names needed to resolve the fields selected on graphene_type. None means everything is
+    # needed: the type did not opt in, or a selected field is not a plain model attribute.
+    if info is None or not getattr(graphene_type._meta, 'projection_pushdown', False):
+        return None
+
+    model = graphene_type._meta.model
+    attributes = model.get_attributes()
+    field_names = get_field_names(graphene_type)
+
+    projection = set(get_key_attribute_names(model))
+    for selection in get_selections(info, field_asts, get_type_names(graphene_type)):
+        name = field_names.get(selection)
+        if selection.startswith('__') or name == 'id':
+            continue
+        if name not in attributes or getattr(graphene_type, 'resolve_' + name, None):
+            return None
+        projection.add(attributes[name].attr_name)
+
+    return sorted(projection)
+
+
+def get_field_names(graphene_type):
+    # map the names fields can be selected with to the names of the fields
+    field_names = dict((to_camel_case(name), name) for name in graphene_type._meta.fields)
+    field_names.update((field.name, name) for name, field in graphene_type._meta.fields.items()
+                       if getattr(field, 'name', None))
+    field_names.update((name, name) for name in graphene_type._meta.fields)
+    return field_names
+
+
+def is_key_only(info, graphene_type, field_asts=None):
+    # the fields selected on graphene_type only need the key, which relationships have without a read
+    field_names = get_field_names(graphene_type)
+    key_names = [name for name, _ in get_model_metadata(graphene_type._meta.model).key_attributes]
+    for selection in get_selections(info, field_asts, get_type_names(graphene_type)):
+        name = field_names.get(selection)
+        if selection.startswith('__') or name == 'id':
+            continue
+        if name not in key_names or getattr(graphene_type, 'resolve_' + name, None):
+            return False
+    return True
+
+
+def is_selected(info, field_name):
+    selections = get_selections(info)
+    return field_name in selections or to_camel_case(field_name) in selections
+
+
+def scan_count(model, filter_condition=None):
+    # paged Select=COUNT scan: DynamoDB still reads every item but returns no attribute payload
+    connection = model._get_connection()
+    operation_kwargs = {TABLE_NAME: model.Meta.table_name, SELECT: COUNT}
+    if filter_condition is not None:
+        name_placeholders = {}
+        expression_attribute_values = {}
+        operation_kwargs[FILTER_EXPRESSION] = filter_condition.serialize(name_placeholders,
+                                                                         expression_attribute_values)
+        operation_kwargs[EXPRESSION_ATTRIBUTE_NAMES] = dict((v, k) for k, v in name_placeholders.items())
+        if expression_attribute_values:
+            operation_kwargs[EXPRESSION_ATTRIBUTE_VALUES] = expression_attribute_values
+
+    count = 0
+    while True:
+        try:
+            data = connection.connection.dispatch(SCAN, operation_kwargs)
+        except (BotoCoreError, ClientError) as e:
+            raise ScanError("Failed to count table: {}".format(e), e)
+        count += data.get(CAMEL_COUNT, 0)
+        if not data.get(LAST_EVALUATED_KEY):
+            return count
+        operation_kwargs[EXCLUSIVE_START_KEY] = data[LAST_EVALUATED_KEY]
+
 
-    if model in MODEL_KEY_REGISTRY:
-        return MODEL_KEY_REGISTRY[model]
+def connection_for_type(_type, _name=None, explain=False):
+    # one connection class per type and name, a second class with the same name would clash in the schema
+    name = _name or _type._meta.name + 'Connection'
+    if (_type, name) not in CONNECTIONS:
+        CONNECTIONS[(_type, name)] = create_connection(_type, name, explain)
+    return CONNECTIONS[(_type, name)]
 
-    for attr in vars(model):
-        attr = getattr(model, attr)
-        if isinstance(attr, Attribute) and attr.is_hash_key:
-            MODEL_KEY_REGISTRY[model] = attr.attr_name
-            return attr.attr_name
 
+def create_connection(_type, _name, explain=False):
+    from .planner import QueryPlanType
 
-def connection_for_type(_type):
     class Connection(graphene.relay.Connection):
         total_count = graphene.Int()
+        if explain:
+            # only the connections of fields with an explain argument have a query plan
+            query_plan = graphene.Field(QueryPlanType)
 
         class Meta:
-            name = _type._meta.name + 'Connection'
+            name = _name
             node = _type
 
-        def resolve_total_count(self, args, context, info):
+        def resolve_total_count(self, info, **args):
             return self.total_count if hasattr(self, "total_count") else len(self.edges)
 
     return Connection